@@ -5,6 +5,7 @@ bandwidth controls, and advanced queue management
 """
 
 import os
+import shutil
 import requests
 import threading
 import asyncio
@@ -470,11 +471,25 @@ class AdvancedDownloadManager:
             for temp_file in temp_files:
                 if os.path.exists(temp_file):
                     with open(temp_file, 'rb') as temp:
-                        while True:
-                            chunk = temp.read(8192)
-                            if not chunk:
-                                break
-                            output.write(chunk)
+                        self._append_file(temp, output)
+    
+    def _append_file(self, source, output):
+        """Append source to output, copied in the kernel where os.sendfile allows"""
+        size = os.fstat(source.fileno()).st_size
+        offset = 0
+        if hasattr(os, 'sendfile'):
+            output.flush()
+            try:
+                while offset < size:
+                    sent = os.sendfile(output.fileno(), source.fileno(), offset, size - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                pass  # e.g. sendfile to a regular file is unsupported; copy the rest below
+        if offset < size:
+            source.seek(offset)
+            shutil.copyfileobj(source, output, 1024 * 1024)
     
     def _update_download_progress(self, task_id: str, progress: float, downloaded: int):
         """Update download progress"""
@@ -21,6 +21,12 @@ from policy_engine import PolicyEngine
 # F7: Security hardening
 from security import safe_join, sanitize_filename, warn_if_executable, PathTraversalError, choose_final_dir
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Module-level logger
 logger = logging.getLogger(__name__)
 
@@ -100,8 +106,14 @@ class DownloadManager:
         }
         
         try:
-            with open(resume_path, 'w') as f:
-                json.dump(state, f, indent=2)
+            # Saved every few seconds mid-download, so keep the encode cheap:
+            # compact output, through orjson when installed
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(state)
+            else:
+                payload = json.dumps(state, separators=(',', ':')).encode('utf-8')
+            with open(resume_path, 'wb') as f:
+                f.write(payload)
             logger.info(f"RESUME | STATE_SAVED | task_id={task_id} | bytes={bytes_completed}")
         except Exception as e:
             logger.warning(f"Failed to save resume state: {e}")
@@ -264,9 +276,15 @@ class DownloadManager:
         }
         return success, info
     
-    def _basic_download(self, url, filepath, progress_callback=None, resume=True, task_id="unknown"):
-        """Basic single-connection download with resume support and atomic file handling"""
+    def _basic_download(self, url, filepath, progress_callback=None, resume=True, task_id="unknown",
+                        info=None):
+        """Basic single-connection download with resume support and atomic file handling
+        
+        If an info dict is given, the verified SHA-256 is stored in it as 'sha256'.
+        """
         filename = os.path.basename(filepath)
+        # SHA-256 accumulated while streaming; None when nothing was streamed
+        hasher = None
         
         # STEP 2: Atomic file handling - use temp file
         temp_filepath = f"{filepath}.part"
@@ -366,10 +384,15 @@ class DownloadManager:
                 start_time = time.time()
                 last_update = start_time
                 
+                # Hash as we write; a resumed file's existing bytes are hashed
+                # first so only that prefix is read back
+                hasher = self._file_hasher(temp_filepath) if mode == 'ab' else hashlib.sha256()
+                
                 with open(temp_filepath, mode) as f:
                     for chunk in response.iter_content(chunk_size=self.max_chunk_size):
                         if chunk:
                             f.write(chunk)
+                            hasher.update(chunk)
                             downloaded_size += len(chunk)
                             
                             # Save resume state periodically
@@ -406,8 +429,14 @@ class DownloadManager:
             # STEP 1: Hash verification on temp file (PRESERVED FROM BASELINE)
             logger.info(f"HASH | START | {filename} | verifying SHA256 | temp={temp_filepath}")
             try:
-                calculated_hash = self._calculate_file_hash(temp_filepath)
+                if hasher is not None:
+                    calculated_hash = hasher.hexdigest()
+                else:
+                    # Temp file was already complete; nothing was streamed
+                    calculated_hash = self._calculate_file_hash(temp_filepath)
                 logger.info(f"HASH | FINAL_OK | {filename} | sha256={calculated_hash[:16]}... | temp={temp_filepath}")
+                if info is not None:
+                    info['sha256'] = calculated_hash
                 
                 # STEP 2: Atomic commit - move temp to final only after hash verification passes (PRESERVED FROM BASELINE)
                 try:
@@ -557,11 +586,17 @@ class DownloadManager:
     
     def _calculate_file_hash(self, filepath):
         """Calculate SHA256 hash of a file for integrity verification"""
-        sha256_hash = hashlib.sha256()
+        return self._file_hasher(filepath).hexdigest()
+    
+    def _file_hasher(self, filepath):
+        """SHA256 hash object over a file's current contents, open for further updates"""
         with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(8192), b""):
+            if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                return hashlib.file_digest(f, 'sha256')
+            sha256_hash = hashlib.sha256()
+            for byte_block in iter(lambda: f.read(1024 * 1024), b""):
                 sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
+        return sha256_hash
     
     def get_file_info(self, url):
         """Get file information without downloading"""
@@ -3,17 +3,24 @@ Enhanced Queue Manager with Scheduling and Conditional Downloads
 Provides aria2-like advanced queuing, scheduling, and conditional download features
 """
 
+import sys
 import time
+import heapq
+import itertools
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable, Any, Union
 from dataclasses import dataclass, field
-from queue import PriorityQueue, Queue
+from queue import Queue
 import json
 import os
 import logging
 from enum import Enum
 
+# slots=True (3.10+) drops the per-instance __dict__ on queued tasks;
+# older interpreters fall back to regular dataclasses.
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
 class DownloadConditionType(Enum):
     """Types of download conditions"""
     TIME_BASED = "time_based"
@@ -29,15 +36,49 @@ class ScheduleType(Enum):
     RECURRING = "recurring"
     CONDITIONAL = "conditional"
 
-@dataclass
+@dataclass(**_SLOTS)
 class DownloadCondition:
     """Represents a condition for download execution"""
     type: DownloadConditionType
     parameters: Dict[str, Any]
     description: str = ""
+    # Last (memo_key, result) pair; see _memo_key
+    _memo: Optional[tuple] = field(default=None, repr=False, compare=False)
     
     def evaluate(self, context: Dict[str, Any]) -> bool:
-        """Evaluate if condition is met"""
+        """Evaluate if condition is met, reusing the last result when the
+        context inputs this condition depends on are unchanged"""
+        key = self._memo_key(context)
+        if key is not None and self._memo is not None and self._memo[0] == key:
+            return self._memo[1]
+        
+        result = self._evaluate(context)
+        if key is not None:
+            self._memo = (key, result)
+        return result
+    
+    def _memo_key(self, context: Dict[str, Any]) -> Optional[tuple]:
+        """Key capturing every input the evaluation reads, or None if uncacheable"""
+        if self.type == DownloadConditionType.SIZE_BASED:
+            return (context.get('file_size', 0),)
+        if self.type == DownloadConditionType.BANDWIDTH_BASED:
+            return (context.get('available_bandwidth', float('inf')),)
+        if self.type == DownloadConditionType.DEPENDENCY_BASED:
+            # Only the listed task ids matter, whatever else the sets hold
+            completed = context.get('completed_downloads', ())
+            failed = context.get('failed_downloads', ())
+            return (frozenset(d for d in self.parameters.get('requires_completed', ()) if d in completed),
+                    frozenset(d for d in self.parameters.get('blocks_if_failed', ()) if d in failed))
+        if self.type == DownloadConditionType.TIME_BASED:
+            # start/end times are second-precise; only hour/day rules are cached
+            if 'start_time' in self.parameters or 'end_time' in self.parameters:
+                return None
+            now = datetime.now()
+            return (now.hour, now.weekday())
+        return None
+    
+    def _evaluate(self, context: Dict[str, Any]) -> bool:
+        """Dispatch to the evaluator for this condition type"""
         if self.type == DownloadConditionType.TIME_BASED:
             return self._evaluate_time_condition(context)
         elif self.type == DownloadConditionType.SIZE_BASED:
@@ -130,7 +171,7 @@ class DownloadCondition:
         
         return True
 
-@dataclass
+@dataclass(**_SLOTS)
 class ScheduleInfo:
     """Information about download scheduling"""
     type: ScheduleType
@@ -157,7 +198,7 @@ class ScheduleInfo:
         
         return None
 
-@dataclass(order=True)
+@dataclass(order=True, **_SLOTS)
 class EnhancedDownloadTask:
     """Enhanced download task with scheduling and conditions"""
     priority: int
@@ -176,8 +217,14 @@ class EnhancedDownloadTask:
     tags: List[str] = field(compare=False, default_factory=list)
     metadata: Dict[str, Any] = field(compare=False, default_factory=dict)
     
+    # Precomputed at enqueue: no schedule, conditions or dependencies
+    _trivial: bool = field(compare=False, repr=False, default=False)
+    
     def can_execute(self, context: Dict[str, Any]) -> bool:
         """Check if task can be executed based on conditions"""
+        if self._trivial:
+            return True
+        
         # Check schedule
         if self.schedule:
             next_time = self.schedule.get_next_execution_time()
@@ -204,11 +251,20 @@ class EnhancedQueueManager:
         self.max_concurrent_downloads = max_concurrent_downloads
         
         # Queues
-        self.high_priority_queue = PriorityQueue()
-        self.normal_priority_queue = PriorityQueue()
-        self.low_priority_queue = PriorityQueue()
-        self.scheduled_queue = PriorityQueue()  # For scheduled downloads
-        self.waiting_queue = Queue()  # For downloads waiting for conditions
+        # Ready tasks share one heap keyed by (bucket, priority, seq);
+        # bucket 0/1/2 = high/normal/low, seq keeps FIFO order within a priority
+        self._queue = []
+        self._seq = itertools.count()
+        self._bucket_counts = [0, 0, 0]
+        self._scheduled = []  # heap of (execution_timestamp, seq, task)
+        self.waiting_queue = Queue()  # For downloads waiting on size/custom conditions
+        
+        # Waiters partitioned by the event that can unblock them
+        self._time_waiters = []  # heap of (wake_timestamp, seq, task)
+        self._bandwidth_waiters = []  # rechecked when bandwidth is recorded
+        self._dep_waiters = []  # rechecked when a download completes or fails
+        self._waiter_events = set()
+        self._waiter_wakeup = threading.Event()
         
         # Tracking
         self.active_downloads = {}
@@ -234,9 +290,12 @@ class EnhancedQueueManager:
         self.running = False
         self.threads = []
         self.lock = threading.RLock()
+        # Signalled when a task becomes ready or a download slot frees up
+        self._ready = threading.Condition(self.lock)
         
         # Configuration
-        self.bandwidth_monitor = BandwidthMonitor()
+        self.bandwidth_monitor = BandwidthMonitor(
+            on_record=lambda: self._notify_waiters('bandwidth'))
         
         self.logger = logging.getLogger(__name__)
     
@@ -247,12 +306,7 @@ class EnhancedQueueManager:
         
         self.running = True
         
-        # Start scheduler thread
-        scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
-        scheduler_thread.start()
-        self.threads.append(scheduler_thread)
-        
-        # Start condition checker thread
+        # Start condition checker thread (also releases scheduled downloads)
         condition_thread = threading.Thread(target=self._condition_checker_loop, daemon=True)
         condition_thread.start()
         self.threads.append(condition_thread)
@@ -267,6 +321,9 @@ class EnhancedQueueManager:
     def stop(self):
         """Stop the queue manager"""
         self.running = False
+        self._waiter_wakeup.set()
+        with self._ready:
+            self._ready.notify_all()
         
         # Wait for threads to finish
         for thread in self.threads:
@@ -295,6 +352,7 @@ class EnhancedQueueManager:
             dependencies=dependencies or [],
             tags=tags or []
         )
+        task._trivial = not (schedule or conditions or dependencies)
         
         with self.lock:
             # Determine which queue to use
@@ -312,73 +370,133 @@ class EnhancedQueueManager:
         return task_id
     
     def _add_to_priority_queue(self, task: EnhancedDownloadTask, priority: int):
-        """Add task to appropriate priority queue"""
-        if priority <= 2:
-            self.high_priority_queue.put(task)
-        elif priority <= 7:
-            self.normal_priority_queue.put(task)
-        else:
-            self.low_priority_queue.put(task)
+        """Add task to the ready heap under its priority bucket"""
+        bucket = 0 if priority <= 2 else 1 if priority <= 7 else 2
+        with self.lock:
+            heapq.heappush(self._queue, (bucket, priority, next(self._seq), task))
+            self._bucket_counts[bucket] += 1
+            self._ready.notify()
     
     def _add_to_scheduled_queue(self, task: EnhancedDownloadTask):
         """Add task to scheduled queue with execution time as priority"""
         next_time = task.schedule.get_next_execution_time()
         if next_time:
             # Use timestamp as priority (earlier = higher priority)
-            priority = int(next_time.timestamp())
-            scheduled_task = (priority, task)
-            self.scheduled_queue.put(scheduled_task)
-    
-    def _add_to_waiting_queue(self, task: EnhancedDownloadTask):
-        """Add task to waiting queue for condition checking"""
-        self.waiting_queue.put(task)
-    
-    def _scheduler_loop(self):
-        """Process scheduled downloads"""
-        while self.running:
-            try:
-                if not self.scheduled_queue.empty():
-                    priority, task = self.scheduled_queue.get_nowait()
-                    
-                    # Check if it's time to execute
-                    execution_time = datetime.fromtimestamp(priority)
-                    if datetime.now() >= execution_time:
-                        # Move to appropriate queue
-                        context = self._get_current_context()
-                        if task.can_execute(context):
-                            self._add_to_priority_queue(task, task.priority)
-                        else:
-                            self._add_to_waiting_queue(task)
-                    else:
-                        # Put back in queue
-                        self.scheduled_queue.put((priority, task))
-                
-                time.sleep(1)
-                
-            except Exception as e:
-                self.logger.error(f"Scheduler error: {e}")
-                time.sleep(1)
+            with self.lock:
+                heapq.heappush(self._scheduled, (next_time.timestamp(), next(self._seq), task))
+            self._waiter_wakeup.set()
+    
+    def _add_to_waiting_queue(self, task: EnhancedDownloadTask, context: Dict[str, Any] = None):
+        """Park task under the event that can next unblock it
+        
+        A sweep passes the context it already built; a newly added task
+        gets a fresh one.
+        """
+        if context is None:
+            context = self._get_current_context()
+        kind, wake_at = self._classify_waiter(task, context)
+        with self.lock:
+            if kind == 'time':
+                heapq.heappush(self._time_waiters, (wake_at, next(self._seq), task))
+            elif kind == 'bandwidth':
+                self._bandwidth_waiters.append(task)
+            elif kind == 'dependency':
+                self._dep_waiters.append(task)
+            else:
+                self.waiting_queue.put(task)
+        self._waiter_wakeup.set()
+    
+    def _classify_waiter(self, task: EnhancedDownloadTask, context: Dict[str, Any]):
+        """Return (kind, wake_timestamp) for the first unmet gate of a task"""
+        now = datetime.now()
+        if task.schedule:
+            next_time = task.schedule.get_next_execution_time()
+            if next_time and now < next_time:
+                return 'time', next_time.timestamp()
+        
+        for condition in task.conditions:
+            if condition.evaluate(context):
+                continue
+            if condition.type == DownloadConditionType.TIME_BASED:
+                return 'time', self._next_time_check(condition, now).timestamp()
+            if condition.type == DownloadConditionType.BANDWIDTH_BASED:
+                return 'bandwidth', None
+            if condition.type == DownloadConditionType.DEPENDENCY_BASED:
+                return 'dependency', None
+            return 'other', None
+        
+        completed_downloads = context.get('completed_downloads', set())
+        if any(dep not in completed_downloads for dep in task.dependencies):
+            return 'dependency', None
+        
+        # Everything passes now; let the next sweep promote it
+        return 'time', now.timestamp()
+    
+    @staticmethod
+    def _next_time_check(condition: DownloadCondition, now: datetime) -> datetime:
+        """Earliest time an unmet time condition could flip"""
+        if 'start_time' in condition.parameters:
+            start_time = datetime.fromisoformat(condition.parameters['start_time'])
+            if now < start_time:
+                return start_time
+        # allowed_hours/blocked_days only change on the hour
+        return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    
+    def _notify_waiters(self, event: str):
+        """Flag an event ('bandwidth' or 'dependency') for the condition checker"""
+        with self.lock:
+            self._waiter_events.add(event)
+        self._waiter_wakeup.set()
     
     def _condition_checker_loop(self):
-        """Check waiting downloads for condition fulfillment"""
+        """Release due scheduled downloads and check waiting downloads
+        
+        Only waiters whose unblocking event has occurred are re-evaluated:
+        due entries of the time heap, bandwidth waiters after a bandwidth
+        sample, dependency waiters after a completion/failure. Size/custom
+        waiters are still swept every 5 seconds.
+        """
+        next_sweep = 0.0
         while self.running:
             try:
+                self._waiter_wakeup.clear()
+                now = time.time()
                 waiting_tasks = []
                 
-                # Collect all waiting tasks
-                while not self.waiting_queue.empty():
-                    waiting_tasks.append(self.waiting_queue.get_nowait())
-                
-                # Check each task
-                context = self._get_current_context()
+                with self.lock:
+                    while self._scheduled and self._scheduled[0][0] <= now:
+                        waiting_tasks.append(heapq.heappop(self._scheduled)[-1])
+                    while self._time_waiters and self._time_waiters[0][0] <= now:
+                        waiting_tasks.append(heapq.heappop(self._time_waiters)[-1])
+                    
+                    if 'bandwidth' in self._waiter_events:
+                        waiting_tasks.extend(self._bandwidth_waiters)
+                        self._bandwidth_waiters = []
+                    if 'dependency' in self._waiter_events:
+                        waiting_tasks.extend(self._dep_waiters)
+                        self._dep_waiters = []
+                    self._waiter_events.clear()
+                    
+                    if now >= next_sweep:
+                        while not self.waiting_queue.empty():
+                            waiting_tasks.append(self.waiting_queue.get_nowait())
+                        next_sweep = now + 5  # Check conditions every 5 seconds
+                    
+                    timeout = next_sweep - now
+                    for heap in (self._scheduled, self._time_waiters):
+                        if heap:
+                            timeout = min(timeout, heap[0][0] - now)
                 
-                for task in waiting_tasks:
-                    if task.can_execute(context):
-                        self._add_to_priority_queue(task, task.priority)
-                    else:
-                        self.waiting_queue.put(task)
+                if waiting_tasks:
+                    context = self._get_current_context()
+                    for task in waiting_tasks:
+                        if task.can_execute(context):
+                            self._add_to_priority_queue(task, task.priority)
+                        else:
+                            self._add_to_waiting_queue(task, context)
+                    continue
                 
-                time.sleep(5)  # Check conditions every 5 seconds
+                self._waiter_wakeup.wait(max(timeout, 0))
                 
             except Exception as e:
                 self.logger.error(f"Condition checker error: {e}")
@@ -388,10 +506,14 @@ class EnhancedQueueManager:
         """Process download queues"""
         while self.running:
             try:
-                with self.lock:
-                    if len(self.active_downloads) >= self.max_concurrent_downloads:
-                        time.sleep(0.1)
-                        continue
+                with self._ready:
+                    # Sleep until a task is ready and a slot is free
+                    while self.running and (
+                            not self._queue or
+                            len(self.active_downloads) >= self.max_concurrent_downloads):
+                        self._ready.wait()
+                    if not self.running:
+                        break
                     
                     # Get next task (high priority first)
                     task = self._get_next_task()
@@ -400,27 +522,18 @@ class EnhancedQueueManager:
                         # Start download
                         self._start_download(task)
                 
-                time.sleep(0.1)
-                
             except Exception as e:
                 self.logger.error(f"Queue processor error: {e}")
                 time.sleep(1)
     
     def _get_next_task(self) -> Optional[EnhancedDownloadTask]:
         """Get the next task to execute"""
-        # Try high priority queue first
-        if not self.high_priority_queue.empty():
-            return self.high_priority_queue.get_nowait()
-        
-        # Then normal priority
-        if not self.normal_priority_queue.empty():
-            return self.normal_priority_queue.get_nowait()
-        
-        # Finally low priority
-        if not self.low_priority_queue.empty():
-            return self.low_priority_queue.get_nowait()
-        
-        return None
+        with self.lock:
+            if not self._queue:
+                return None
+            bucket, _, _, task = heapq.heappop(self._queue)
+            self._bucket_counts[bucket] -= 1
+            return task
     
     def _start_download(self, task: EnhancedDownloadTask):
         """Start a download task"""
@@ -441,18 +554,18 @@ class EnhancedQueueManager:
             'completed_downloads': self.completed_downloads.copy(),
             'failed_downloads': self.failed_downloads.copy(),
             'active_downloads': len(self.active_downloads),
-            'available_bandwidth': self.bandwidth_monitor.get_available_bandwidth(),
-            'queue_sizes': self._get_queue_sizes()
+            'available_bandwidth': self.bandwidth_monitor.get_available_bandwidth()
         }
     
     def _get_queue_sizes(self) -> Dict[str, int]:
         """Get current queue sizes"""
         return {
-            'high': self.high_priority_queue.qsize(),
-            'normal': self.normal_priority_queue.qsize(),
-            'low': self.low_priority_queue.qsize(),
-            'scheduled': self.scheduled_queue.qsize(),
-            'waiting': self.waiting_queue.qsize()
+            'high': self._bucket_counts[0],
+            'normal': self._bucket_counts[1],
+            'low': self._bucket_counts[2],
+            'scheduled': len(self._scheduled),
+            'waiting': (self.waiting_queue.qsize() + len(self._time_waiters)
+                        + len(self._bandwidth_waiters) + len(self._dep_waiters))
         }
     
     def _update_queue_stats(self):
@@ -466,6 +579,8 @@ class EnhancedQueueManager:
                 task_info = self.active_downloads.pop(task_id)
                 self.completed_downloads.add(task_id)
                 self.stats['total_completed'] += 1
+                self._notify_waiters('dependency')
+                self._ready.notify()
                 
                 # Handle recurring downloads
                 task = task_info['task']
@@ -479,6 +594,7 @@ class EnhancedQueueManager:
             if task_id in self.active_downloads:
                 task_info = self.active_downloads.pop(task_id)
                 task = task_info['task']
+                self._ready.notify()
                 
                 # Try retry if available
                 if task.retry_count < task.max_retries:
@@ -488,6 +604,7 @@ class EnhancedQueueManager:
                 else:
                     self.failed_downloads.add(task_id)
                     self.stats['total_failed'] += 1
+                    self._notify_waiters('dependency')
                     self.logger.error(f"Download {task_id} failed permanently: {error}")
     
     def pause_download(self, task_id: str):
@@ -496,6 +613,7 @@ class EnhancedQueueManager:
             if task_id in self.active_downloads:
                 task_info = self.active_downloads.pop(task_id)
                 self.paused_downloads[task_id] = task_info
+                self._ready.notify()
     
     def resume_download(self, task_id: str):
         """Resume a paused download"""
@@ -509,7 +627,8 @@ class EnhancedQueueManager:
         """Cancel a download"""
         with self.lock:
             # Remove from active downloads
-            self.active_downloads.pop(task_id, None)
+            if self.active_downloads.pop(task_id, None):
+                self._ready.notify()
             
             # Remove from paused downloads
             self.paused_downloads.pop(task_id, None)
@@ -573,9 +692,10 @@ class EnhancedQueueManager:
 class BandwidthMonitor:
     """Monitor available bandwidth for conditional downloads"""
     
-    def __init__(self):
+    def __init__(self, on_record: Optional[Callable[[], None]] = None):
         self.measurements = []
         self.measurement_window = 300  # 5 minutes
+        self.on_record = on_record
     
     def record_usage(self, bytes_per_second: float):
         """Record bandwidth usage"""
@@ -585,6 +705,9 @@ class BandwidthMonitor:
         # Clean old measurements
         cutoff = now - self.measurement_window
         self.measurements = [(t, bps) for t, bps in self.measurements if t > cutoff]
+        
+        if self.on_record:
+            self.on_record()
     
     def get_average_usage(self) -> float:
         """Get average bandwidth usage"""
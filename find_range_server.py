@@ -1,24 +1,23 @@
 """Find a server that supports range requests"""
 
-import requests
+from http_range_detector import supports_http_range, supports_http_range_many
+
+def _print_result(url, supported, info):
+    print(f'Testing: {url}')
+    print(f'  Status: {info["status_code"]}')
+    print(f'  Accept-Ranges: {info["accept_ranges"] or "NOT PRESENT"}')
+    print(f'  Content-Range: {info["content_range"] or "NOT PRESENT"}')
+    if supported:
+        print(f'  ✅ SUPPORTS RANGE REQUESTS!')
+    else:
+        print(f'  ❌ Does not support range requests ({info["reason"]})')
 
 def test_range_support(url):
-    try:
-        print(f'Testing: {url}')
-        headers = {'Range': 'bytes=0-1023'}
-        resp = requests.get(url, headers=headers, timeout=10)
-        print(f'  Status: {resp.status_code}')
-        print(f'  Accept-Ranges: {resp.headers.get("accept-ranges", "NOT PRESENT")}')
-        print(f'  Content-Range: {resp.headers.get("content-range", "NOT PRESENT")}')
-        if resp.status_code == 206:
-            print(f'  ✅ SUPPORTS RANGE REQUESTS!')
-            return True
-        else:
-            print(f'  ❌ Does not support range requests')
-            return False
-    except Exception as e:
-        print(f'  Error: {e}')
-        return False
+    # Shares the detector's streamed 1-byte probe, so a server
+    # that ignores Range never has its full body downloaded
+    supported, info = supports_http_range(url)
+    _print_result(url, supported, info)
+    return supported
 
 def main():
     # Test with servers known to support range requests
@@ -31,8 +30,11 @@ def main():
     
     supporting_servers = []
     
-    for url in urls_to_test:
-        if test_range_support(url):
+    # Probe all URLs at once; results come back in input order
+    results = supports_http_range_many(urls_to_test)
+    for url, (supported, info) in zip(urls_to_test, results):
+        _print_result(url, supported, info)
+        if supported:
             supporting_servers.append(url)
         print()
     
@@ -41,4 +43,4 @@ def main():
         print(f"  {url}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -8,21 +8,225 @@ Only reads existing state/logs, writes export files
 """
 
 import os
+import re
+import mmap
 import json
 import zipfile
 import tempfile
 import subprocess
+import functools
 import logging
 import platform
 import sys
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 import uuid
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import attrgetter
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    from isal import isal_zlib
+    ISAL_AVAILABLE = True
+except ImportError:
+    ISAL_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Interpreter/OS details do not change during a process lifetime
+_PY_VER = platform.python_version()
+_PLATFORM_INFO = f"{platform.system()} {platform.release()}"
+
+# Background exports run one at a time off the caller's thread
+_EXPORT_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forensics-export")
+
+# Files at or below this size are stored uncompressed; deflating tiny
+# state/metadata files costs CPU for no meaningful size gain
+SMALL_ENTRY_BYTES = 64 * 1024
+
+# The log scan checkpoint holds every event up to its offset (timelines need
+# them all), so it is only written while that stays small. Past this many
+# events the last checkpoint is kept and later exports scan on from there;
+# loading and rewriting a multi-MB checkpoint costs more than the scan saves.
+SCAN_STATE_MAX_EVENTS = 5000
+
+# With ISA-L available, export archives deflate through isal_zlib (same
+# stream format, several times faster); its level 1 compresses about as well
+# as zlib's default. Without it the stdlib zlib and its default level are used.
+# The hook is a private ZipFile method, so it is only installed where this
+# interpreter's zipfile still has it (and the writer still has a compressor).
+if ISAL_AVAILABLE and hasattr(zipfile.ZipFile, '_open_to_write'):
+    _ZIP_COMPRESSLEVEL = 1
+
+    class _ExportZipFile(zipfile.ZipFile):
+        """ZipFile whose deflated entries are compressed with ISA-L
+        
+        Only archives written by the exporter use it; the stdlib zipfile
+        module and every other reader/writer keep plain zlib.
+        """
+        
+        def _open_to_write(self, zinfo, force_zip64=False):
+            dest = super()._open_to_write(zinfo, force_zip64)
+            if zinfo.compress_type == zipfile.ZIP_DEFLATED and hasattr(dest, '_compressor'):
+                # Raw deflate stream, as zipfile's own compressor produces
+                dest._compressor = isal_zlib.compressobj(
+                    _ZIP_COMPRESSLEVEL, isal_zlib.DEFLATED, -15)
+            return dest
+else:
+    _ZIP_COMPRESSLEVEL = None
+    _ExportZipFile = zipfile.ZipFile
+
+# Log line format: timestamp - logger - level - message (split on the first
+# three " - " separators, surrounding whitespace ignored)
+_LOG_LINE_RE = re.compile(rb'^[ \t]*(.*?) - (.*?) - (.*?) - (.*?)[ \t\r]*$', re.M)
+
+# Lines that can yield a task event; everything else is skipped undecoded
+_TASK_EVENT_RE = re.compile(
+    rb'POLICY \||HASH \||ATOMIC \||RESUME \||ENQUEUE|START_WORKER|DOWNLOAD_COMPLETE|DOWNLOAD_FAILED'
+)
+
+# key=value extractors; values end at whitespace or a "|" separator
+_KV_RE = {k: re.compile(rf"{k}=([^\s|]*)") for k in ("task_id", "final")}
+
+def _iter_json_array(items):
+    """Yield a JSON array one serialized element at a time
+    
+    Keeps peak memory at a single element instead of the whole document.
+    """
+    yield b"[\n"
+    first = True
+    for item in items:
+        if not first:
+            yield b",\n"
+        first = False
+        yield _dumps_json(item)
+    yield b"\n]\n"
+
+def _parse_log_timestamp(raw: bytes) -> str:
+    """Convert a logging asctime (YYYY-MM-DD HH:MM:SS,fff) to UTC ISO format
+    
+    The usual fixed-width form is sliced into integers directly, avoiding
+    strptime; anything else goes through strptime, and unparseable stamps
+    fall back to the current time.
+    """
+    try:
+        if (len(raw) == 23 and raw[4:5] == b'-' and raw[7:8] == b'-' and raw[10:11] == b' '
+                and raw[13:14] == b':' and raw[16:17] == b':' and raw[19:20] == b','):
+            timestamp = datetime(int(raw[0:4]), int(raw[5:7]), int(raw[8:10]),
+                                 int(raw[11:13]), int(raw[14:16]), int(raw[17:19]),
+                                 int(raw[20:23]) * 1000, tzinfo=timezone.utc)
+        else:
+            timestamp = datetime.strptime(raw.decode('utf-8', 'replace'), "%Y-%m-%d %H:%M:%S,%f")
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.isoformat()
+    except:
+        return datetime.now(timezone.utc).isoformat()
+
+def _dumps_json(obj) -> bytes:
+    """Serialize to indented JSON, via orjson when installed (dataclasses supported)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_DATACLASS,
+                            default=str)
+    if isinstance(obj, list):
+        obj = [asdict(o) if hasattr(o, '__dataclass_fields__') else o for o in obj]
+    elif hasattr(obj, '__dataclass_fields__'):
+        obj = asdict(obj)
+    return json.dumps(obj, indent=2, default=str).encode('utf-8')
+
+def _git_dirs(root: Path) -> tuple:
+    """Return (git_dir, common_dir) for the repository at root
+    
+    In a linked worktree (or submodule) .git is a file holding
+    "gitdir: <path>"; that directory has HEAD, while branch refs and
+    packed-refs live in the shared directory named by its commondir file.
+    Both pointers may be relative.
+    """
+    git_dir = root / ".git"
+    if git_dir.is_file():
+        pointer = git_dir.read_text().strip()
+        if not pointer.startswith("gitdir:"):
+            raise ValueError(f"unexpected .git file: {pointer!r}")
+        git_dir = root / pointer[len("gitdir:"):].strip()
+    common_dir = git_dir
+    commondir_file = git_dir / "commondir"
+    if commondir_file.is_file():
+        common_dir = git_dir / commondir_file.read_text().strip()
+    return git_dir, common_dir
+
+def _resolve_ref(common_dir: Path, ref: str) -> Optional[str]:
+    """SHA of a branch ref, loose or (after `git gc`) packed"""
+    try:
+        return (common_dir / ref).read_text().strip()
+    except OSError:
+        pass
+    try:
+        with open(common_dir / "packed-refs") as f:
+            for line in f:
+                sha, _, name = line.rstrip("\n").partition(" ")
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+def _git_rev_parse(*args) -> str:
+    """Run `git rev-parse` in the current directory ("unknown" on failure)"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", *args],
+            cwd=".",
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+@functools.lru_cache(maxsize=1)
+def _read_git_info() -> tuple:
+    """Return (sha, branch), reading .git directly instead of forking git
+    
+    Layouts this does not understand (no .git in the current directory,
+    unusual ref storage) fall back to `git rev-parse`.
+    """
+    try:
+        git_dir, common_dir = _git_dirs(Path("."))
+        head = (git_dir / "HEAD").read_text().strip()
+        if not head.startswith("ref: "):
+            return head, "HEAD"  # detached, same as `git rev-parse --abbrev-ref`
+        ref = head[len("ref: "):]
+        sha = _resolve_ref(common_dir, ref)
+        if sha:
+            branch = ref[len("refs/heads/"):] if ref.startswith("refs/heads/") else ref
+            return sha, branch
+    except (OSError, ValueError):
+        pass
+    return _git_rev_parse("HEAD"), _git_rev_parse("--abbrev-ref", "HEAD")
+
+def _write_file_entry(zf: zipfile.ZipFile, path, arcname: str, st: os.stat_result = None):
+    """Copy a file into the archive, compression chosen by size
+    
+    Small files are read in one go and stored as-is through writestr,
+    reusing the caller's stat result when one is available.
+    """
+    st = st or os.stat(path)
+    if st.st_size > SMALL_ENTRY_BYTES:
+        zf.write(path, arcname, compress_type=zipfile.ZIP_DEFLATED)
+        return
+        
+    zi = zipfile.ZipInfo(arcname, time.localtime(st.st_mtime)[:6])
+    zi.external_attr = (st.st_mode & 0xFFFF) << 16
+    zi.compress_type = zipfile.ZIP_STORED
+    with open(path, 'rb') as f:
+        zf.writestr(zi, f.read())
+
 @dataclass
 class SessionMetadata:
     """Session tracking for forensic continuity"""
@@ -63,41 +267,27 @@ class ForensicsExporter:
         self.session_metadata = session_metadata or self._create_session_metadata()
         self.logger = logging.getLogger("forensics")
         self.export_base_path = Path("exports")
-        self.export_base_path.mkdir(exist_ok=True)
+        self._export_started_at = None
         
         self.logger.info(f"FORENSICS | SESSION_START | session_id={self.session_metadata.session_id}")
         
-    def _create_session_metadata(self) -> SessionMetadata:
+    @staticmethod
+    def _create_session_metadata() -> SessionMetadata:
         """Create session tracking metadata"""
-        session_id = f"session_{int(datetime.now().timestamp())}_{str(uuid.uuid4())[:8]}"
+        created_at = datetime.now(timezone.utc)
+        session_id = f"session_{int(created_at.timestamp())}_{str(uuid.uuid4())[:8]}"
         
         # Get git information
-        try:
-            git_sha = subprocess.check_output(
-                ["git", "rev-parse", "HEAD"], 
-                cwd=".", 
-                stderr=subprocess.DEVNULL
-            ).decode().strip()
-        except:
-            git_sha = "unknown"
-            
-        try:
-            git_branch = subprocess.check_output(
-                ["git", "rev-parse", "--abbrev-ref", "HEAD"], 
-                cwd=".", 
-                stderr=subprocess.DEVNULL
-            ).decode().strip()
-        except:
-            git_branch = "unknown"
+        git_sha, git_branch = _read_git_info()
         
         return SessionMetadata(
             session_id=session_id,
-            created_at=datetime.now(timezone.utc).isoformat(),
+            created_at=created_at.isoformat(),
             app_version="v2.0-step6",
-            python_version=platform.python_version(),
+            python_version=_PY_VER,
             git_sha=git_sha,
             git_branch=git_branch,
-            platform_info=f"{platform.system()} {platform.release()}"
+            platform_info=_PLATFORM_INFO
         )
     
     def export_diagnostic_pack(self) -> str:
@@ -105,14 +295,27 @@ class ForensicsExporter:
         Create complete forensic diagnostic pack
         Returns path to created ZIP file
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # One instant stamps the file name and every section of the pack
+        started_at = datetime.now(timezone.utc)
+        self._export_started_at = started_at.isoformat()
+        timestamp = started_at.astimezone().strftime("%Y%m%d_%H%M%S")
         export_filename = f"ngk_diagnostics_{self.session_metadata.session_id}_{timestamp}.zip"
         export_path = self.export_base_path / export_filename
+        self.export_base_path.mkdir(exist_ok=True)
         
         self.logger.info(f"FORENSICS | EXPORT_START | file={export_filename}")
         
         try:
-            with zipfile.ZipFile(export_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            # Generated sections are rendered to bytes on worker threads while
+            # this thread copies files into the archive; ZipFile itself is
+            # only ever touched from this thread
+            with ThreadPoolExecutor(max_workers=3, thread_name_prefix="forensics-section") as pool, \
+                    _ExportZipFile(export_path, 'w', zipfile.ZIP_DEFLATED,
+                                   compresslevel=_ZIP_COMPRESSLEVEL) as zf:
+                policy_snapshot = pool.submit(self._render_policy_snapshot)
+                build_metadata = pool.submit(self._render_build_metadata)
+                task_timelines = pool.submit(self._render_task_timelines)
+                
                 # 1. Session metadata
                 self._add_session_metadata(zf)
                 
@@ -126,13 +329,14 @@ class ForensicsExporter:
                 self._add_resume_state_files(zf)
                 
                 # 5. Policy configuration
-                self._add_policy_config(zf)
+                self._add_policy_file(zf)
+                self._write_entries(zf, policy_snapshot.result())
                 
                 # 6. Build metadata
-                self._add_build_metadata(zf)
+                self._write_entries(zf, build_metadata.result())
                 
                 # 7. Per-task timelines
-                self._add_task_timelines(zf)
+                self._write_entries(zf, task_timelines.result())
                 
             self.logger.info(f"FORENSICS | EXPORT_COMPLETE | file={export_filename} | size={export_path.stat().st_size}")
             return str(export_path)
@@ -140,64 +344,106 @@ class ForensicsExporter:
         except Exception as e:
             self.logger.error(f"FORENSICS | EXPORT_FAIL | error={str(e)}")
             raise
+        finally:
+            # Later renders outside an export stamp their own time again
+            self._export_started_at = None
+    
+    def export_diagnostic_pack_async(self) -> Future:
+        """
+        Run export_diagnostic_pack on a background thread
+        Returns a Future resolving to the ZIP path
+        """
+        return _EXPORT_POOL.submit(self.export_diagnostic_pack)
+    
+    def _export_timestamp(self) -> str:
+        """ISO timestamp of the export in progress (now, outside an export)"""
+        return self._export_started_at or datetime.now(timezone.utc).isoformat()
+    
+    @staticmethod
+    def _write_entries(zf: zipfile.ZipFile, entries):
+        """Write (arcname, data, compress_type) entries
+        
+        data is either bytes or an iterable of byte chunks, which is
+        streamed into the archive without being joined first.
+        """
+        for arcname, data, compress_type in entries:
+            if isinstance(data, (bytes, str)):
+                zf.writestr(arcname, data, compress_type=compress_type)
+                continue
+            zi = zipfile.ZipInfo(arcname, time.localtime()[:6])
+            zi.compress_type = compress_type
+            zi.external_attr = 0o600 << 16
+            with zf.open(zi, 'w') as out:
+                for chunk in data:
+                    out.write(chunk)
     
     def _add_session_metadata(self, zf: zipfile.ZipFile):
         """Add session metadata to export"""
-        metadata_json = json.dumps(asdict(self.session_metadata), indent=2)
-        zf.writestr("session_metadata.json", metadata_json)
+        metadata_json = _dumps_json(self.session_metadata)
+        zf.writestr("session_metadata.json", metadata_json, compress_type=zipfile.ZIP_STORED)
         
     def _add_log_files(self, zf: zipfile.ZipFile):
         """Add current log files to export"""
         # Current UI log
         ui_log_path = Path("logs/ui.log")
         if ui_log_path.exists():
-            zf.write(ui_log_path, f"logs/{ui_log_path.name}")
+            zf.write(ui_log_path, f"logs/{ui_log_path.name}", compress_type=zipfile.ZIP_DEFLATED)
             
         # Find latest DL Manager logs  
         dl_logs_dir = Path.home() / "Downloads" / "DL Manager Logs"
         if dl_logs_dir.exists():
-            log_files = list(dl_logs_dir.glob("NGKs_DownloadManager_Log_*.log"))
-            if log_files:
-                # Get most recent log file
-                latest_log = max(log_files, key=lambda f: f.stat().st_mtime)
-                zf.write(latest_log, f"logs/{latest_log.name}")
+            # Track the most recent log file during a single directory scan
+            latest_log, latest_mtime = None, None
+            with os.scandir(dl_logs_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    if not (name.startswith("NGKs_DownloadManager_Log_") and name.endswith(".log")):
+                        continue
+                    mtime = entry.stat().st_mtime
+                    if latest_mtime is None or mtime > latest_mtime:
+                        latest_log, latest_mtime = entry, mtime
+            if latest_log is not None:
+                zf.write(latest_log.path, f"logs/{latest_log.name}", compress_type=zipfile.ZIP_DEFLATED)
                 
     def _add_queue_state_files(self, zf: zipfile.ZipFile):
         """Add queue persistence files to export"""
         queue_state_path = Path("data/queue_state.json")
         if queue_state_path.exists():
-            zf.write(queue_state_path, f"queue/{queue_state_path.name}")
+            _write_file_entry(zf, queue_state_path, f"queue/{queue_state_path.name}")
             
     def _add_resume_state_files(self, zf: zipfile.ZipFile):
         """Add any resume state files to export"""
         # Look for .resume files in downloads directory
         downloads_dir = Path.home() / "Downloads" / "NGK_Downloads"
         if downloads_dir.exists():
-            resume_files = list(downloads_dir.glob("*.resume"))
-            for resume_file in resume_files:
-                zf.write(resume_file, f"resume_states/{resume_file.name}")
+            with os.scandir(downloads_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".resume") and entry.is_file(follow_symlinks=False):
+                        _write_file_entry(zf, entry.path, f"resume_states/{entry.name}", entry.stat())
                 
-    def _add_policy_config(self, zf: zipfile.ZipFile):
-        """Add policy configuration to export"""
+    def _add_policy_file(self, zf: zipfile.ZipFile):
+        """Add the on-disk policy file to export"""
         policy_path = Path("config/policy.json")
         if policy_path.exists():
-            zf.write(policy_path, f"policy/{policy_path.name}")
+            _write_file_entry(zf, policy_path, f"policy/{policy_path.name}")
             
-        # Add effective policy snapshot (runtime resolved)
+    def _render_policy_snapshot(self) -> list:
+        """Render effective policy snapshot (runtime resolved)"""
         try:
             from policy_engine import PolicyEngine
             policy_engine = PolicyEngine()
             effective_policy = policy_engine.get_policy_summary()
             
-            policy_json = json.dumps(effective_policy, indent=2)
-            zf.writestr("policy/effective_policy_snapshot.json", policy_json)
+            policy_json = _dumps_json(effective_policy)
+            return [("policy/effective_policy_snapshot.json", policy_json, zipfile.ZIP_STORED)]
         except Exception as e:
             self.logger.warning(f"Could not capture effective policy: {e}")
+            return []
             
-    def _add_build_metadata(self, zf: zipfile.ZipFile):
-        """Add build and version metadata to export"""
+    def _render_build_metadata(self) -> list:
+        """Render build and version metadata"""
         build_info = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "timestamp": self._export_timestamp(),
             "git_sha": self.session_metadata.git_sha,
             "git_branch": self.session_metadata.git_branch,
             "python_version": self.session_metadata.python_version,
@@ -208,35 +454,40 @@ class ForensicsExporter:
         
         # Add package versions if available
         try:
-            import pkg_resources
+            from importlib.metadata import version, PackageNotFoundError
             installed_packages = []
             for req in ["requests", "PySide6", "qt6tools"]:
                 try:
-                    pkg = pkg_resources.get_distribution(req)
-                    installed_packages.append(f"{pkg.project_name}=={pkg.version}")
-                except:
+                    installed_packages.append(f"{req}=={version(req)}")
+                except PackageNotFoundError:
                     pass
             build_info["key_packages"] = installed_packages
         except:
             pass
             
-        build_json = json.dumps(build_info, indent=2)
-        zf.writestr("build_metadata.json", build_json)
+        build_json = _dumps_json(build_info)
+        return [("build_metadata.json", build_json, zipfile.ZIP_STORED)]
+        
+    def _render_task_timelines(self) -> list:
+        """Render per-task timelines and their summary
         
-    def _add_task_timelines(self, zf: zipfile.ZipFile):
-        """Add per-task timelines to export"""
+        The timelines document is returned as a chunk generator so it is
+        serialized while being written rather than held whole in memory.
+        """
         try:
             timelines = self._build_task_timelines()
-            timelines_json = json.dumps([asdict(t) for t in timelines], indent=2, default=str)
-            zf.writestr("timelines/per_task_timelines.json", timelines_json)
+            timelines_json = _iter_json_array(timelines)
             
             # Add summary timeline
             summary = self._create_timeline_summary(timelines)
-            summary_json = json.dumps(summary, indent=2)
-            zf.writestr("timelines/timeline_summary.json", summary_json)
+            summary_json = _dumps_json(summary)
+            
+            return [("timelines/per_task_timelines.json", timelines_json, zipfile.ZIP_DEFLATED),
+                    ("timelines/timeline_summary.json", summary_json, zipfile.ZIP_STORED)]
             
         except Exception as e:
             self.logger.warning(f"Could not build task timelines: {e}")
+            return []
             
     def _build_task_timelines(self) -> List[TaskTimeline]:
         """Build ordered timeline for each task from logs"""
@@ -247,22 +498,22 @@ class ForensicsExporter:
         if ui_log_path.exists():
             task_events = self._parse_log_for_task_events(ui_log_path)
             
+            # One stable sort up front keeps every task group ordered; log
+            # lines are already near-sorted so this is close to linear
+            task_events.sort(key=attrgetter('timestamp'))
+            
             # Group events by task_id
-            task_groups = {}
+            task_groups = defaultdict(list)
             for event in task_events:
-                if event.task_id not in task_groups:
-                    task_groups[event.task_id] = []
                 task_groups[event.task_id].append(event)
                 
             # Create timeline for each task
             for task_id, events in task_groups.items():
-                events.sort(key=lambda e: e.timestamp)
-                
                 # Determine final status
                 final_status = "UNKNOWN"
-                for event in reversed(events):
-                    if event.event_type in ["COMPLETE", "FAIL"]:
-                        final_status = event.event_type
+                for i in range(len(events) - 1, -1, -1):
+                    if events[i].event_type in ("COMPLETE", "FAIL"):
+                        final_status = events[i].event_type
                         break
                         
                 # Calculate duration if possible
@@ -287,40 +538,101 @@ class ForensicsExporter:
         return timelines
         
     def _parse_log_for_task_events(self, log_path: Path) -> List[TaskEvent]:
-        """Parse log file to extract task events"""
+        """Parse log file to extract task events
+        
+        Events from complete lines are checkpointed with the byte offset
+        reached, so the next export only scans what was appended since.
+        The checkpoint is not advanced past SCAN_STATE_MAX_EVENTS events.
+        """
         events = []
         
         try:
-            with open(log_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                        
-                    # Parse log line format: timestamp - logger - level - message
-                    parts = line.split(' - ', 3)
-                    if len(parts) < 4:
-                        continue
-                        
-                    timestamp_str, logger_name, level, message = parts
+            stat = log_path.stat()
+            offset, events = self._load_scan_state(log_path, stat)
+            if stat.st_size <= offset:
+                return events
+                
+            # Scan the mapped file with one compiled regex instead of
+            # decoding and splitting every line in Python
+            with open(log_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                size = len(mm)
+                complete_end = mm.rfind(b'\n', offset) + 1
+                if complete_end > offset:
+                    events.extend(self._scan_log_events(mm, offset, complete_end))
+                    offset = complete_end
+                    if len(events) <= SCAN_STATE_MAX_EVENTS:
+                        self._save_scan_state(log_path, stat, offset, events)
+                    
+                # A trailing line still being written is reported but not checkpointed
+                if size > offset:
+                    return events + self._scan_log_events(mm, offset, size)
                     
-                    # Convert timestamp to ISO format
-                    try:
-                        timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S,%f")
-                        timestamp_iso = timestamp.replace(tzinfo=timezone.utc).isoformat()
-                    except:
-                        timestamp_iso = datetime.now(timezone.utc).isoformat()
-                        
-                    # Extract task events based on log patterns
-                    task_event = self._extract_task_event(timestamp_iso, logger_name, message)
-                    if task_event:
-                        events.append(task_event)
-                        
         except Exception as e:
             self.logger.warning(f"Error parsing log {log_path}: {e}")
             
         return events
         
+    def _scan_log_events(self, buf, start: int, end: int) -> List[TaskEvent]:
+        """Extract task events from buf[start:end] (start must begin a line)"""
+        events = []
+        for match in _LOG_LINE_RE.finditer(buf, start, end):
+            raw_message = match.group(4)
+            if not _TASK_EVENT_RE.search(raw_message):
+                continue
+                
+            logger_name = match.group(2).decode('utf-8', 'replace')
+            message = raw_message.decode('utf-8', 'replace')
+            
+            # Convert timestamp to ISO format
+            timestamp_iso = _parse_log_timestamp(match.group(1))
+                
+            # Extract task events based on log patterns
+            task_event = self._extract_task_event(timestamp_iso, logger_name, message)
+            if task_event:
+                events.append(task_event)
+        return events
+        
+    def _scan_state_path(self) -> Path:
+        return self.export_base_path / ".forensics_state.json"
+        
+    def _load_scan_state(self, log_path: Path, stat: os.stat_result):
+        """Return (offset, events) checkpointed for log_path, or (0, [])
+        
+        The checkpoint is discarded when the log was rotated or truncated
+        (different inode, or shorter than the saved offset).
+        """
+        try:
+            with open(self._scan_state_path(), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if (state.get("log_path") != str(log_path.resolve())
+                    or state.get("inode") != stat.st_ino
+                    or state.get("offset", 0) > stat.st_size):
+                return 0, []
+            return state["offset"], [TaskEvent(*e) for e in state["events"]]
+        except Exception:
+            return 0, []
+            
+    def _save_scan_state(self, log_path: Path, stat: os.stat_result, offset: int,
+                         events: List[TaskEvent]):
+        """Atomically persist the scan checkpoint next to the exports"""
+        state = {
+            "log_path": str(log_path.resolve()),
+            "inode": stat.st_ino,
+            "offset": offset,
+            "events": [[e.timestamp, e.task_id, e.event_type, e.component, e.action, e.details]
+                       for e in events],
+        }
+        try:
+            self.export_base_path.mkdir(exist_ok=True)
+            state_path = self._scan_state_path()
+            tmp_path = state_path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_path, state_path)
+        except Exception as e:
+            self.logger.warning(f"Could not save log scan checkpoint: {e}")
+            
     def _extract_task_event(self, timestamp: str, logger_name: str, message: str) -> Optional[TaskEvent]:
         """Extract task event from log message"""
         
@@ -379,18 +691,8 @@ class ForensicsExporter:
         
     def _extract_value(self, message: str, key: str) -> Optional[str]:
         """Extract value from log message key=value format"""
-        try:
-            if f"{key}=" in message:
-                start = message.find(f"{key}=") + len(key) + 1
-                end = message.find(" ", start)
-                if end == -1:
-                    end = message.find("|", start)
-                if end == -1:
-                    end = len(message)
-                return message[start:end].strip()
-        except:
-            pass
-        return None
+        match = _KV_RE[key].search(message)
+        return match.group(1) if match else None
         
     def _create_timeline_summary(self, timelines: List[TaskTimeline]) -> Dict[str, Any]:
         """Create high-level timeline summary"""
@@ -403,7 +705,7 @@ class ForensicsExporter:
             "completed_tasks": completed_tasks,
             "failed_tasks": failed_tasks,
             "unknown_status": total_tasks - completed_tasks - failed_tasks,
-            "created_at": datetime.now(timezone.utc).isoformat(),
+            "created_at": self._export_timestamp(),
             "session_id": self.session_metadata.session_id
         }
         
@@ -426,7 +728,7 @@ def get_session_metadata() -> SessionMetadata:
     """Get or create global session metadata"""
     global _session_metadata
     if _session_metadata is None:
-        _session_metadata = ForensicsExporter()._create_session_metadata()
+        _session_metadata = ForensicsExporter._create_session_metadata()
         logger.info(f"FORENSICS | SESSION_CREATED | session_id={_session_metadata.session_id}")
     return _session_metadata
 
@@ -436,6 +738,12 @@ def export_diagnostics() -> str:
     exporter = ForensicsExporter(session)
     return exporter.export_diagnostic_pack()
 
+def export_diagnostics_async() -> Future:
+    """Export diagnostic pack in the background; Future resolves to the ZIP path"""
+    session = get_session_metadata()
+    exporter = ForensicsExporter(session)
+    return exporter.export_diagnostic_pack_async()
+
 if __name__ == "__main__":
     # CLI entry point
     print("NGK's Download Manager V2.0 - Forensics Export")
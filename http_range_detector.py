@@ -5,18 +5,109 @@ Provides reliable detection of server support for HTTP Range requests
 
 import requests
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
 
-def supports_http_range(url, timeout=10):
+# Shared keep-alive session: repeated probes to a host reuse its connection
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=64)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# Recent detection results keyed by scheme://host/path (LRU with TTL)
+_CACHE_MAX_ENTRIES = 256
+_CACHE_TTL_SECONDS = 300
+_result_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path}"
+
+
+def _cache_get(key):
+    with _cache_lock:
+        entry = _result_cache.get(key)
+        if entry is None:
+            return None
+        stored_at, supports_range, info = entry
+        if time.monotonic() - stored_at > _CACHE_TTL_SECONDS:
+            del _result_cache[key]
+            return None
+        _result_cache.move_to_end(key)
+        return supports_range, dict(info)
+
+
+def _cache_put(key, supports_range, info):
+    with _cache_lock:
+        _result_cache[key] = (time.monotonic(), supports_range, dict(info))
+        _result_cache.move_to_end(key)
+        while len(_result_cache) > _CACHE_MAX_ENTRIES:
+            _result_cache.popitem(last=False)
+
+
+def clear_range_cache():
+    """Forget cached detection results (e.g. after a server changed)"""
+    with _cache_lock:
+        _result_cache.clear()
+
+
+def supports_http_range(url, timeout=10, use_cache=True):
     """
     Detect if a server supports HTTP Range requests
     
     Args:
         url (str): URL to test
         timeout (int): Request timeout in seconds
+        use_cache (bool): Reuse a recent result for the same URL
         
     Returns:
         tuple: (supports_range: bool, info: dict)
     """
+    key = _cache_key(url)
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            logging.info(f"Range detection: using cached result for {url}")
+            return cached
+    
+    supports_range, info = _detect_http_range(url, timeout)
+    # Probe errors are transient; only cache definitive answers
+    if not info['reason'].startswith('probe_error'):
+        _cache_put(key, supports_range, info)
+    return supports_range, info
+
+
+def supports_http_range_many(urls, timeout=10, max_workers=8):
+    """
+    Detect range support for several URLs concurrently
+    
+    Probes are I/O bound, so running them on a small thread pool over the
+    shared session makes total time ~max(RTT) rather than sum(RTT).
+    
+    Returns:
+        list: (supports_range, info) tuples in the same order as urls
+    """
+    urls = list(urls)
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls))) as pool:
+        return list(pool.map(lambda u: supports_http_range(u, timeout), urls))
+
+
+def _detect_http_range(url, timeout):
+    """Run the range probe against the server
+    
+    No separate HEAD request is sent: the probe response carries the same
+    Accept-Ranges header, and its Content-Range (or Content-Length on a 200)
+    gives the full size, so one round trip decides. Its validators and
+    response time are recorded too, so callers need no HEAD of their own.
+    """
     info = {
         'url': url,
         'method_used': None,
@@ -24,50 +115,44 @@ def supports_http_range(url, timeout=10):
         'accept_ranges': None,
         'content_range': None,
         'content_length': None,
+        'etag': None,
+        'last_modified': None,
+        'response_time': None,
         'reason': 'unknown'
     }
     
     try:
-        # Step 1: Try HEAD request as hint
-        logging.info(f"Range detection: checking HEAD for {url}")
-        head_resp = requests.head(url, allow_redirects=True, timeout=timeout)
-        info['accept_ranges'] = head_resp.headers.get('accept-ranges', 'none')
-        info['content_length'] = head_resp.headers.get('content-length')
-        
-        if info['accept_ranges'].lower() == 'bytes':
-            logging.info("Range detection: HEAD indicates bytes support")
-        else:
-            logging.info(f"Range detection: HEAD shows accept-ranges={info['accept_ranges']}")
-            
-    except Exception as e:
-        logging.warning(f"Range detection: HEAD request failed for {url}: {e}")
-        info['accept_ranges'] = 'unknown'
-    
-    try:
-        # Step 2: Probe with minimal range request (definitive test)
+        # Probe with minimal range request (definitive test)
         logging.info(f"Range detection: probing with range request for {url}")
         probe_headers = {'Range': 'bytes=0-0', 'Accept-Encoding': 'identity'}
-        probe_resp = requests.get(url, headers=probe_headers, stream=True, allow_redirects=True, timeout=timeout)
+        probe_resp = _SESSION.get(url, headers=probe_headers, stream=True, allow_redirects=True, timeout=timeout)
         
         info['method_used'] = 'range_probe'
         info['status_code'] = probe_resp.status_code
         info['content_range'] = probe_resp.headers.get('content-range')
+        info['accept_ranges'] = probe_resp.headers.get('accept-ranges', 'none')
+        info['etag'] = probe_resp.headers.get('etag')
+        info['last_modified'] = probe_resp.headers.get('last-modified')
+        info['response_time'] = probe_resp.elapsed.total_seconds()
+        if info['content_range'] and '/' in info['content_range']:
+            total = info['content_range'].rsplit('/', 1)[1].strip()
+            info['content_length'] = total if total != '*' else None
+        elif probe_resp.status_code == 200:
+            info['content_length'] = probe_resp.headers.get('content-length')
         
         # Range support requires status 206 AND Content-Range header
         if probe_resp.status_code == 206 and info['content_range']:
             info['reason'] = f"status=206 content-range={info['content_range']}"
             logging.info(f"Range detection: SUCCESS - {info['reason']}")
+            # The 1-byte body is consumed so close() hands the connection
+            # back to the session pool for the next probe
+            probe_resp.content
             probe_resp.close()
             return True, info
         else:
-            # Read at most 1KB then close to avoid full download on range-ignored servers
-            if probe_resp.status_code != 206:
-                content_read = b''
-                for chunk in probe_resp.iter_content(chunk_size=1024):
-                    content_read += chunk
-                    if len(content_read) >= 1024:
-                        break
-                probe_resp.close()
+            # The body is never needed: closing unread drops the connection
+            # instead of pulling (possibly the whole file) off the socket
+            probe_resp.close()
                 
             if probe_resp.status_code == 200:
                 info['reason'] = "status=200 (range ignored, full content returned)"
@@ -4,25 +4,222 @@ Safe integration with existing download manager - no claims, only verified behav
 """
 
 import os
+import re
+import sys
+import math
+import mmap
+import errno
+import socket
+import certifi
 import requests
+from requests.adapters import HTTPAdapter
+import urllib3
 import threading
 import time
 import json
 import hashlib
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
+from urllib.parse import urlparse
 from typing import Optional, Dict, List, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from http_range_detector import supports_http_range
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 # Module logger
 logger = logging.getLogger(__name__)
 
+# Read size for streamed responses and part-file merges; large reads keep
+# per-chunk Python overhead out of the transfer loop
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Receive buffer requested for segment sockets. Not applied on Linux: an
+# explicit SO_RCVBUF there turns off receive-window autotuning and is capped
+# by net.core.rmem_max, which usually leaves the window smaller than before.
+SOCKET_RCVBUF_BYTES = 4 * 1024 * 1024
+
+_SOCKET_OPTIONS = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)]
+if not sys.platform.startswith('linux'):
+    _SOCKET_OPTIONS.append((socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_RCVBUF_BYTES))
+
+# Connection pools shared by every SegmentDownloader, so the segments of a
+# download (and later downloads from the same host) reuse connections.
+# Retries mirror requests' defaults: follow redirects, never retry a request.
+# CA bundle and proxies also follow requests (REQUESTS_CA_BUNDLE/certifi,
+# HTTP(S)_PROXY and NO_PROXY), so segments reach whatever the probe reached.
+_POOL_KW = dict(
+    maxsize=16,
+    retries=urllib3.Retry(total=None, connect=0, read=False, status=0, other=0, redirect=30),
+    socket_options=_SOCKET_OPTIONS,
+    ca_certs=os.environ.get('REQUESTS_CA_BUNDLE') or os.environ.get('CURL_CA_BUNDLE') or certifi.where(),
+)
+_SEGMENT_POOL = urllib3.PoolManager(**_POOL_KW)
+_PROXY_POOLS = {}  # proxy URL -> ProxyManager
+_PROXY_POOLS_LOCK = threading.Lock()
+
+
+def _segment_pool(url: str) -> urllib3.PoolManager:
+    """Pool for url: direct, or through the environment proxy requests would use"""
+    proxy = requests.utils.select_proxy(url, requests.utils.get_environ_proxies(url))
+    if not proxy:
+        return _SEGMENT_POOL
+    proxy = requests.utils.prepend_scheme_if_needed(proxy, 'http')
+    
+    with _PROXY_POOLS_LOCK:
+        pool = _PROXY_POOLS.get(proxy)
+        if pool is None:
+            username, password = requests.utils.get_auth_from_url(proxy)
+            if proxy.lower().startswith('socks'):
+                # Needs PySocks, as it does for requests
+                from urllib3.contrib.socks import SOCKSProxyManager
+                pool = SOCKSProxyManager(proxy, username=username or None,
+                                         password=password or None, **_POOL_KW)
+            else:
+                proxy_headers = (urllib3.make_headers(proxy_basic_auth=f"{username}:{password}")
+                                 if username else None)
+                pool = urllib3.ProxyManager(proxy, proxy_headers=proxy_headers, **_POOL_KW)
+            _PROXY_POOLS[proxy] = pool
+    return pool
+
+# Connection auto-tuning: one ranged probe of PROBE_BYTES measures a host's
+# single-connection throughput, and enough connections are opened to keep
+# TARGET_INFLIGHT_BYTES in flight (throughput x round-trip time per connection)
+PROBE_BYTES = 1024 * 1024
+TARGET_INFLIGHT_BYTES = 4 * 1024 * 1024
+
+# Files are cut into segment_size work items (fewer, larger ones for files
+# that would need more than MAX_SEGMENTS) which the connections take in turn
+MAX_SEGMENTS = 256
+
+# With auto-tuning, a segment is sized to take about SEGMENT_TARGET_SECONDS at
+# the host's measured throughput: small on slow links (a failure loses little
+# and the tail balances well), large on fast ones (fewer requests)
+SEGMENT_TARGET_SECONDS = 2.0
+MIN_SEGMENT_SIZE = 1024 * 1024
+MAX_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Measured single-connection throughput (bytes/s) per host
+_HOST_THROUGHPUT: Dict[str, float] = {}
+
+# Progress is reported when bytes arrive or a segment finishes, but no more
+# often than PROGRESS_MIN_INTERVAL; with nothing happening the monitor
+# still wakes every PROGRESS_IDLE_INTERVAL
+PROGRESS_MIN_INTERVAL = 0.25
+PROGRESS_IDLE_INTERVAL = 1.0
+
+# In-place downloads checkpoint their progress at most this often, or
+# sooner once this many new bytes have been written
+STATE_FLUSH_INTERVAL = 2.0
+STATE_FLUSH_BYTES = 16 * 1024 * 1024
+
+# A failed segment is retried from where it stopped, after 1 s, 2 s, 4 s...
+# (at most SEGMENT_RETRY_MAX_DELAY), before the download gives up on it
+SEGMENT_RETRIES = 3
+SEGMENT_RETRY_BASE_DELAY = 1.0
+SEGMENT_RETRY_MAX_DELAY = 30.0
+
+# Flushes file data (not metadata) where the platform can
+_fdatasync = getattr(os, 'fdatasync', os.fsync)
+
+# Errors meaning "this copy primitive is unavailable here", not "the copy failed"
+_COPY_FALLBACK_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP}
+
+
+def _copy_into(src_fd: int, dst_fd: int, size: int, dst_offset: int) -> int:
+    """Copy the first size bytes of src_fd into dst_fd at dst_offset
+    
+    Uses an in-kernel copy where available (copy_file_range, then sendfile
+    on Linux) and otherwise writes straight out of a memory map of the
+    source, with no per-chunk reads. Returns the number of
+    bytes copied, which is short only if the source ends early.
+    """
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                n = os.copy_file_range(src_fd, dst_fd, size - copied, copied, dst_offset + copied)
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+    
+    os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+    if sys.platform.startswith('linux'):
+        try:
+            while copied < size:
+                n = os.sendfile(dst_fd, src_fd, copied, size - copied)
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except OSError as e:
+            if e.errno not in _COPY_FALLBACK_ERRNOS:
+                raise
+            os.lseek(dst_fd, dst_offset + copied, os.SEEK_SET)
+    
+    end = min(size, os.fstat(src_fd).st_size)
+    if copied < end:
+        with mmap.mmap(src_fd, 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            while copied < end:
+                copied += os.write(dst_fd, view[copied:end])
+    return copied
+
+
+# Page-cache hints (None where posix_fadvise is unavailable)
+_FADV_SEQUENTIAL = getattr(os, 'POSIX_FADV_SEQUENTIAL', None)
+_FADV_DONTNEED = getattr(os, 'POSIX_FADV_DONTNEED', None)
+
+
+def _fadvise(fd: int, offset: int, length: int, advice: Optional[int]):
+    """Pass a page-cache hint to the kernel; hints are optional, so failures are ignored"""
+    if advice is None:
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, advice)
+    except OSError:
+        pass
+
+
+def _merge_part(part_file: str, temp_file: str, dst_offset: int, size: int) -> int:
+    """Copy one part file into its region of the merge target"""
+    with open(part_file, 'rb') as infile, open(temp_file, 'r+b') as outfile:
+        # Part files are read once and deleted: read ahead, then drop them
+        # from the page cache (the merged file's pages are left alone)
+        _fadvise(infile.fileno(), 0, 0, _FADV_SEQUENTIAL)
+        copied = _copy_into(infile.fileno(), outfile.fileno(), size, dst_offset)
+        _fadvise(infile.fileno(), 0, 0, _FADV_DONTNEED)
+        return copied
+
+
+def _preallocate(fd: int, size: int):
+    """Reserve size bytes for fd where supported, and extend the file to size"""
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass  # Preallocation is best effort
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
 class SegmentDownloader:
     """Downloads a single segment of a file"""
     
     def __init__(self, url: str, start: int, end: int, part_file: str, 
-                 segment_id: int, timeout: int = 30, resume_from: int = 0, cancel_event: threading.Event = None):
+                 segment_id: int, timeout: int = 30, resume_from: int = 0, cancel_event: threading.Event = None,
+                 shared_fd: int = None, on_progress: Callable[[int], None] = None,
+                 validator: Optional[str] = None, abort_event: threading.Event = None,
+                 pool: urllib3.PoolManager = None):
         self.url = url
         self.start = start
         self.end = end
@@ -31,16 +228,58 @@ class SegmentDownloader:
         self.timeout = timeout
         self.resume_from = resume_from  # Bytes already downloaded
         self.cancel_event = cancel_event  # Cancellation signal
+        self.shared_fd = shared_fd  # If set, write at the segment's offsets in this fd instead of part_file
+        self.on_progress = on_progress  # Called with the size of each chunk written
+        self.validator = validator  # ETag or Last-Modified sent as If-Range
+        self.abort_event = abort_event  # Set once another segment has failed for good
+        self.pool = pool or _segment_pool(url)  # Direct or proxy pool for url
         
         self.downloaded_bytes = resume_from
         self.status = 'pending'
         self.error = None
+        self.retryable = True  # False once a failure is known not to be transient
+        self._cache_dropped = 0  # Part-file offset below which pages were released
         
+    def _write_in_place(self, chunk: bytes):
+        """Write chunk at the segment's current position in the shared file"""
+        offset = self.start + self.downloaded_bytes
+        if offset + len(chunk) > self.end + 1:
+            raise Exception(f"server sent more than the requested range (offset {offset}, end {self.end})")
+        view = memoryview(chunk)
+        while view:
+            written = os.pwrite(self.shared_fd, view, offset)
+            view = view[written:]
+            offset += written
+    
+    def _write_part(self, f, chunk: bytes):
+        """Append chunk to the part file, releasing cached pages behind the last MiB"""
+        # f is unbuffered, so a write may be partial
+        view = memoryview(chunk)
+        while view:
+            view = view[f.write(view):]
+        # A part file is only read again by the merge, so keeping what was
+        # written in the page cache just evicts other processes' pages
+        offset = self.downloaded_bytes + len(chunk)
+        if offset - self._cache_dropped >= 2 * STREAM_CHUNK_SIZE:
+            keep_from = offset - STREAM_CHUNK_SIZE
+            _fadvise(f.fileno(), self._cache_dropped, keep_from - self._cache_dropped, _FADV_DONTNEED)
+            self._cache_dropped = keep_from
+    
     def download(self) -> bool:
-        """Download the segment to its part file"""
+        """Download the segment to its part file (or its region of shared_fd)"""
         try:
             self.status = 'downloading'
             
+            # Queued behind other segments when cancellation arrived
+            if self.cancel_event and self.cancel_event.is_set():
+                self.status = 'cancelled'
+                logger.info(f"Segment {self.segment_id}: cancelled before start")
+                return False
+            if self.abort_event and self.abort_event.is_set():
+                self.status = 'aborted'
+                logger.info(f"Segment {self.segment_id}: not started, another segment failed")
+                return False
+            
             # Calculate actual start position for resume
             actual_start = self.start + self.resume_from
             if actual_start > self.end:
@@ -49,37 +288,70 @@ class SegmentDownloader:
                 logger.info(f"Segment {self.segment_id}: already complete")
                 return True
                 
-            headers = {'Range': f'bytes={actual_start}-{self.end}'}
+            # keep-alive also lets HTTP/1.0 servers hold the connection for the next range
+            headers = {'Range': f'bytes={actual_start}-{self.end}', 'Connection': 'keep-alive'}
+            if self.validator:
+                # The server answers 200 instead of 206 if the resource changed
+                headers['If-Range'] = self.validator
             mode = 'ab' if self.resume_from > 0 else 'wb'
             
             logger.info(f"Segment {self.segment_id}: downloading bytes {actual_start}-{self.end} (resume from {self.resume_from})")
             
-            response = requests.get(self.url, headers=headers, stream=True, 
-                                  allow_redirects=True, timeout=self.timeout)
-            
-            if response.status_code != 206:
-                if response.status_code == 200:
-                    self.status = 'failed'
-                    self.error = 'range ignored'
-                    logger.error(f"Segment {self.segment_id}: range ignored (got 200 instead of 206)")
-                    return False
-                raise Exception(f"Unexpected status code: {response.status_code}")
-                
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(self.part_file), exist_ok=True)
-            
-            # Write segment data
-            with open(self.part_file, mode) as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    # Check for cancellation
-                    if self.cancel_event and self.cancel_event.is_set():
-                        self.status = 'cancelled'
-                        logger.info(f"Segment {self.segment_id}: cancelled by user")
+            response = self.pool.request('GET', self.url, headers=headers,
+                                         preload_content=False, timeout=self.timeout)
+            try:
+                if response.status != 206:
+                    if response.status == 200:
+                        self.status = 'failed'
+                        self.error = 'range ignored or resource changed'
+                        self.retryable = False
+                        logger.error(f"Segment {self.segment_id}: range ignored or resource changed "
+                                     f"(got 200 instead of 206)")
                         return False
-                        
-                    if chunk:
-                        f.write(chunk)
-                        self.downloaded_bytes += len(chunk)
+                    # Server errors and throttling may clear up; other statuses will not
+                    self.retryable = response.status >= 500 or response.status == 429
+                    raise Exception(f"Unexpected status code: {response.status}")
+                    
+                # Write segment data (raw bytes: a byte range is never content-decoded)
+                # Chunks are already STREAM_CHUNK_SIZE, so part files are opened
+                # unbuffered rather than copied through a BufferedWriter
+                with (open(self.part_file, mode, buffering=0) if self.shared_fd is None else nullcontext()) as f:
+                    if f is not None:
+                        _fadvise(f.fileno(), 0, 0, _FADV_SEQUENTIAL)
+                        self._cache_dropped = self.downloaded_bytes
+                        write = lambda chunk: self._write_part(f, chunk)
+                    else:
+                        write = self._write_in_place
+                    is_cancelled = self.cancel_event.is_set if self.cancel_event else bool
+                    is_aborted = self.abort_event.is_set if self.abort_event else bool
+                    on_progress = self.on_progress
+                    for chunk in response.stream(STREAM_CHUNK_SIZE, decode_content=False):
+                        # Check for cancellation
+                        if is_cancelled():
+                            self.status = 'cancelled'
+                            logger.info(f"Segment {self.segment_id}: cancelled by user")
+                            return False
+                        if is_aborted():
+                            self.status = 'aborted'
+                            logger.info(f"Segment {self.segment_id}: stopped, another segment failed")
+                            return False
+                            
+                        if chunk:
+                            write(chunk)
+                            self.downloaded_bytes += len(chunk)
+                            if on_progress:
+                                on_progress(len(chunk))
+                
+                # Part files are size-checked before merging; in-place
+                # regions have no file of their own to check afterwards
+                if self.shared_fd is not None and self.start + self.downloaded_bytes != self.end + 1:
+                    raise Exception(f"short segment ({self.downloaded_bytes} of {self.end - self.start + 1} bytes)")
+            finally:
+                # A partly read body leaves the connection unusable; close it
+                # rather than hand it back to the pool
+                if not response.closed:
+                    response.close()
+                response.release_conn()
             
             self.status = 'completed'
             logger.info(f"Segment {self.segment_id}: completed {self.downloaded_bytes} bytes")
@@ -97,26 +369,85 @@ class IntegratedMultiDownloader:
     Only uses multi-connection for verified Range-capable servers
     """
     
-    def __init__(self, max_connections: int = 4, segment_size: int = 8 * 1024 * 1024):
+    def __init__(self, max_connections: int = 4, segment_size: int = 8 * 1024 * 1024,
+                 use_pwrite: bool = True, auto_tune: bool = True):
         self.max_connections = max_connections
-        self.segment_size = segment_size  # 8MB default
+        self.segment_size = segment_size  # 8MB default (auto-tuning sizes segments from measured throughput)
+        # Size the connection count to the measured link instead of always
+        # using max_connections
+        self.auto_tune = auto_tune
+        # Write segments straight into the temp file (no part files, no merge)
+        # where os.pwrite exists; otherwise fall back to part files
+        self.use_pwrite = use_pwrite and hasattr(os, 'pwrite')
         self.timeout = 30
         self.cancel_event = threading.Event()  # For cancellation support
+        # Set when a segment of the current download fails for good (or on cancel)
+        self._abort_event = threading.Event()
+        
+        # Keep-alive session for the single-connection fallback (segments use
+        # the shared segment pools)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.max_connections,
+                              pool_maxsize=self.max_connections, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Bytes written by the current download's segments; segments add to
+        # it and notify the monitor under _progress_cv
+        self._progress_cv = threading.Condition()
+        self._total_downloaded = 0
+        
+        # Progress checkpointing for in-place downloads (see _maybe_save_state)
+        self._last_flush_time = 0.0
+        self._flushed_bytes = 0
         
     def cancel_download(self):
         """Cancel the current download"""
         self.cancel_event.set()
+        self._abort_event.set()  # Wakes segments waiting to retry
+        # Drop pooled connections so a streaming fallback stops promptly;
+        # the session reconnects on its next request
+        self.session.close()
         logger.info("Download cancellation requested")
         
     def _get_state_file_path(self, destination: str) -> str:
         """Get path to resume state file for STEP 3 compatibility"""
         return f"{destination}.downloadstate.json"
     
+    @staticmethod
+    def _state_segment(i: int, seg_data) -> dict:
+        """State entry for a segment given as a dict or a (start, end, part_file, id) tuple"""
+        if isinstance(seg_data, dict):
+            get = seg_data.get
+            return {
+                "id": get('id', i),
+                "start": get('start', 0),
+                "end": get('end', 0),
+                "part_file": get('part_file', ''),
+                "bytes_written": get('bytes_written', 0),
+                "verified": get('completed', False)
+            }
+        return {
+            "id": i,
+            "start": seg_data[0],
+            "end": seg_data[1],
+            "part_file": seg_data[2],
+            "bytes_written": 0,
+            "verified": False
+        }
+    
     def _save_state(self, task_id: str, url: str, destination: str, total_size: int, segments: list, 
-                   etag: str = None, last_modified: str = None):
-        """Save download state for resume following STEP 3 format"""
+                   etag: str = None, last_modified: str = None, direct_write: bool = False,
+                   checkpoint: bool = False):
+        """Save download state for resume following STEP 3 format
+        
+        The file is written compactly (it is machine-read) and atomically
+        replaced; checkpoint=True also fsyncs it before the replace.
+        """
+        state_segments = [self._state_segment(i, seg_data) for i, seg_data in enumerate(segments)]
         # Calculate total bytes completed
-        bytes_completed = sum(seg.get('bytes_written', 0) for seg in segments if isinstance(seg, dict))
+        bytes_completed = sum(seg['bytes_written'] for seg in state_segments)
+        now = datetime.now()
         
         state = {
             "version": "3.0",
@@ -125,29 +456,20 @@ class IntegratedMultiDownloader:
             "final_path": destination,
             "temp_path": f"{destination}.part",
             "mode": "multi",
+            "direct_write": direct_write,
             "total_size": total_size,
             "max_connections": self.max_connections,
             "bytes_completed": bytes_completed,
             "etag": etag,
             "last_modified": last_modified,
-            "segments": [
-                {
-                    "id": seg_data.get('id', i) if isinstance(seg_data, dict) else i,
-                    "start": seg_data.get('start', 0) if isinstance(seg_data, dict) else seg_data[0],
-                    "end": seg_data.get('end', 0) if isinstance(seg_data, dict) else seg_data[1], 
-                    "part_file": seg_data.get('part_file', '') if isinstance(seg_data, dict) else seg_data[2],
-                    "bytes_written": seg_data.get('bytes_written', 0) if isinstance(seg_data, dict) else 0,
-                    "verified": seg_data.get('completed', False) if isinstance(seg_data, dict) else False
-                }
-                for i, seg_data in enumerate(segments)
-            ],
+            "segments": state_segments,
             "timestamps": {
-                "created": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat(),
+                "created": now.isoformat(),
+                "last_updated": now.isoformat(),
                 "last_verified": None
             },
             "session": {
-                "id": f"session_{datetime.now().strftime('%Y%m%d%H%M%S')}",
+                "id": f"session_{now.strftime('%Y%m%d%H%M%S')}",
                 "crash_recovery": True
             }
         }
@@ -155,8 +477,15 @@ class IntegratedMultiDownloader:
         state_file = self._get_state_file_path(destination)
         temp_file = f"{state_file}.tmp"
         try:
-            with open(temp_file, 'w') as f:
-                json.dump(state, f, indent=2)
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(state)
+            else:
+                payload = json.dumps(state, separators=(',', ':')).encode('utf-8')
+            with open(temp_file, 'wb') as f:
+                f.write(payload)
+                if checkpoint:
+                    f.flush()
+                    os.fsync(f.fileno())
             
             # Atomic replacement (preserving baseline integrity)
             os.replace(temp_file, state_file)
@@ -169,6 +498,73 @@ class IntegratedMultiDownloader:
                     pass
             logger.warning(f"Failed to save state: {e}")
     
+    @staticmethod
+    def _segments_progress(downloaders: list) -> list:
+        """Per-segment state entries describing how far each downloader got"""
+        return [
+            {'id': d.segment_id, 'start': d.start, 'end': d.end, 'part_file': d.part_file,
+             'bytes_written': d.downloaded_bytes, 'completed': d.status == 'completed'}
+            for d in downloaders
+        ]
+    
+    def _maybe_save_state(self, task_id: str, url: str, destination: str, total_size: int,
+                          downloaders: list, shared_fd: int, etag: str = None, last_modified: str = None,
+                          force: bool = False) -> bool:
+        """Checkpoint in-place progress once enough time or data has accumulated
+        
+        Segment data is flushed to disk before the state that describes it,
+        so a saved state never claims bytes that could still be lost.
+        Returns True if the state was written.
+        """
+        written = self._total_downloaded
+        if written == self._flushed_bytes and not force:
+            return False  # Nothing new since the last save
+        if not force and time.monotonic() - self._last_flush_time < STATE_FLUSH_INTERVAL \
+                and written - self._flushed_bytes < STATE_FLUSH_BYTES:
+            return False
+            
+        # Snapshot progress before syncing: segments keep writing meanwhile,
+        # and only bytes counted before the sync are guaranteed on disk by it
+        segments = self._segments_progress(downloaders)
+        _fdatasync(shared_fd)
+        self._save_state(task_id, url, destination, total_size, segments,
+                         etag, last_modified, direct_write=True, checkpoint=force)
+        self._last_flush_time = time.monotonic()
+        self._flushed_bytes = written
+        return True
+    
+    def _record_progress(self, nbytes: int):
+        """Count bytes written by a segment and wake the progress monitor"""
+        with self._progress_cv:
+            self._total_downloaded += nbytes
+            self._progress_cv.notify()
+    
+    def _run_segment(self, downloader: SegmentDownloader) -> bool:
+        """Download a segment, retrying transient failures with exponential backoff
+        
+        A segment that still fails sets _abort_event so the others stop.
+        """
+        for attempt in range(SEGMENT_RETRIES + 1):
+            if downloader.download():
+                return True
+            if downloader.status != 'failed' or not downloader.retryable or attempt == SEGMENT_RETRIES:
+                break
+            delay = min(SEGMENT_RETRY_MAX_DELAY, SEGMENT_RETRY_BASE_DELAY * 2 ** attempt)
+            logger.info(f"Segment {downloader.segment_id}: retry {attempt + 1}/{SEGMENT_RETRIES} in {delay:.0f}s")
+            # Another segment's failure (or cancellation) ends the wait early
+            if self._abort_event.wait(delay) or self.cancel_event.is_set():
+                break
+            downloader.resume_from = downloader.downloaded_bytes
+        
+        if downloader.status == 'failed':
+            self._abort_event.set()
+        return False
+    
+    def _notify_progress(self, *_):
+        """Wake the progress monitor (used when a segment finishes)"""
+        with self._progress_cv:
+            self._progress_cv.notify()
+    
     def _load_state(self, destination: str) -> Optional[dict]:
         """Load download state for resume (STEP 3 format)."""
         state_file = self._get_state_file_path(destination)
@@ -198,22 +594,27 @@ class IntegratedMultiDownloader:
             logger.warning(f"Failed to cleanup resume state: {e}")
     def _archive_old_state(self, destination: str):
         """Archive old state and part files"""
-        import time
         timestamp = int(time.time())
         
         state_file = self._get_state_file_path(destination)
-        if os.path.exists(state_file):
-            archived_state = f"{state_file}.{timestamp}.archived"
+        archived_state = f"{state_file}.{timestamp}.archived"
+        try:
             os.rename(state_file, archived_state)
             logger.info(f"Archived old state to {archived_state}")
+        except FileNotFoundError:
+            pass
         
-        # Archive part files
-        for i in range(self.max_connections * 2):  # Check more than max to be safe
-            part_file = f"{destination}.part{i:03d}"
-            if os.path.exists(part_file):
-                archived_part = f"{part_file}.{timestamp}.archived"
-                os.rename(part_file, archived_part)
-                logger.info(f"Archived old part file to {archived_part}")
+        # Archive part files (<name>.partNNN), found with one directory listing
+        directory = os.path.dirname(destination) or '.'
+        part_name = re.compile(re.escape(os.path.basename(destination)) + r'\.part\d{3}')
+        try:
+            entries = [entry.path for entry in os.scandir(directory) if part_name.fullmatch(entry.name)]
+        except FileNotFoundError:
+            entries = []
+        for part_file in sorted(entries):
+            archived_part = f"{part_file}.{timestamp}.archived"
+            os.rename(part_file, archived_part)
+            logger.info(f"Archived old part file to {archived_part}")
     
     def _validate_state_compatibility(self, state: Dict, url: str, total_size: int, 
                                     etag: str = None, last_modified: str = None) -> bool:
@@ -239,25 +640,109 @@ class IntegratedMultiDownloader:
     
     def _check_segment_completion(self, segments_state: list) -> list:
         """Check which segments are complete and update state"""
+        # Part file sizes from one listing per directory instead of a stat
+        # call per segment (on Windows the listing already carries the sizes)
+        wanted = {}
+        for seg_state in segments_state:
+            directory, name = os.path.split(seg_state['part_file'])
+            wanted.setdefault(directory, set()).add(name)
+        part_sizes = {}
+        for directory, names in wanted.items():
+            try:
+                with os.scandir(directory or '.') as entries:
+                    for entry in entries:
+                        if entry.name in names:
+                            part_sizes[(directory, entry.name)] = entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        
         for seg_state in segments_state:
-            part_file = seg_state['part_file']
             expected_size = seg_state['end'] - seg_state['start'] + 1
+            actual_size = part_sizes.get(os.path.split(seg_state['part_file']))
             
-            if os.path.exists(part_file):
-                actual_size = os.path.getsize(part_file)
-                if actual_size == expected_size:
-                    seg_state['completed'] = True
-                    seg_state['bytes_written'] = actual_size
-                    logger.info(f"Segment {seg_state['id']}: already complete ({actual_size} bytes)")
-                elif actual_size > 0:
-                    seg_state['bytes_written'] = actual_size
-                    logger.info(f"Segment {seg_state['id']}: partially complete ({actual_size}/{expected_size} bytes)")
-                else:
-                    seg_state['bytes_written'] = 0
+            seg_state['completed'] = False
+            if actual_size is None:
+                seg_state['bytes_written'] = 0
+            elif actual_size == expected_size:
+                seg_state['completed'] = True
+                seg_state['bytes_written'] = actual_size
+                logger.info(f"Segment {seg_state['id']}: already complete ({actual_size} bytes)")
+            elif actual_size > 0:
+                seg_state['bytes_written'] = actual_size
+                logger.info(f"Segment {seg_state['id']}: partially complete ({actual_size}/{expected_size} bytes)")
             else:
                 seg_state['bytes_written'] = 0
                 
         return segments_state
+    
+    def _check_direct_write_progress(self, segments_state: list, temp_path: str) -> list:
+        """Restore per-segment progress recorded for an in-place (pwrite) download"""
+        try:
+            temp_size = os.path.getsize(temp_path)
+        except OSError:
+            temp_size = -1  # Temp file gone: every segment restarts
+            
+        for seg_state in segments_state:
+            expected_size = seg_state['end'] - seg_state['start'] + 1
+            written = seg_state.get('bytes_written', 0)
+            if temp_size < 0 or not 0 <= written <= expected_size or seg_state['start'] + written > temp_size:
+                written = 0
+            seg_state['bytes_written'] = written
+            seg_state['completed'] = written == expected_size
+            if written:
+                logger.info(f"Segment {seg_state['id']}: resuming in place ({written}/{expected_size} bytes)")
+                
+        return segments_state
+        
+    def _probe_throughput(self, url: str) -> Optional[float]:
+        """Single-connection throughput to url's host in bytes/s, measured once per host"""
+        host = urlparse(url).netloc
+        throughput = _HOST_THROUGHPUT.get(host)
+        if throughput:
+            return throughput
+            
+        try:
+            headers = {'Range': f'bytes=0-{PROBE_BYTES - 1}', 'Connection': 'keep-alive'}
+            response = _segment_pool(url).request('GET', url, headers=headers,
+                                                  preload_content=False, timeout=self.timeout)
+            try:
+                if response.status != 206:
+                    return None
+                # Timed from the response headers, so setup and first RTT are excluded
+                started = time.monotonic()
+                received = sum(len(chunk) for chunk in response.stream(STREAM_CHUNK_SIZE, decode_content=False))
+                elapsed = time.monotonic() - started
+            finally:
+                if not response.closed:
+                    response.close()
+                response.release_conn()
+        except Exception as e:
+            logger.info(f"Multi-connection: throughput probe failed - {e}")
+            return None
+            
+        if received <= 0 or elapsed <= 0:
+            return None
+        throughput = received / elapsed
+        _HOST_THROUGHPUT[host] = throughput
+        logger.info(f"Multi-connection: {host} single-connection throughput {throughput / 1e6:.1f} MB/s")
+        return throughput
+    
+    def _plan_connections(self, url: str, rtt: float) -> int:
+        """Connections needed to keep TARGET_INFLIGHT_BYTES in flight, capped at max_connections"""
+        throughput = self._probe_throughput(url)
+        if not throughput or rtt <= 0:
+            return self.max_connections
+        per_connection = throughput * rtt  # Bytes one connection keeps in flight
+        return min(self.max_connections, max(1, math.ceil(TARGET_INFLIGHT_BYTES / per_connection)))
+        
+    def _plan_segment_size(self, url: str, total_size: int, connections: int) -> int:
+        """Segment size for the host's measured throughput, leaving every connection a segment"""
+        throughput = _HOST_THROUGHPUT.get(urlparse(url).netloc)
+        if not throughput:
+            return self.segment_size
+        size = min(int(throughput * SEGMENT_TARGET_SECONDS), -(-total_size // connections))
+        size = min(MAX_SEGMENT_SIZE, max(MIN_SEGMENT_SIZE, size))
+        return size - size % STREAM_CHUNK_SIZE or STREAM_CHUNK_SIZE
         
     def download(self, url: str, destination: str, progress_callback: Optional[Callable] = None) -> Tuple[bool, Dict]:
         """
@@ -286,15 +771,16 @@ class IntegratedMultiDownloader:
         start_time = time.time()
         
         try:
-            # Step 1: Check if server supports range requests
-            supports_range, range_info = supports_http_range(url)
+            # Step 1: Check if server supports range requests. The probe is
+            # sent fresh rather than cached: its response also supplies the
+            # size and validators, which would otherwise take a HEAD request
+            supports_range, range_info = supports_http_range(url, timeout=self.timeout, use_cache=False)
             info['range_support_info'] = range_info
             
-            # Step 2: Get content length and etag/last-modified for resume validation
-            head_resp = requests.head(url, allow_redirects=True, timeout=self.timeout)
-            content_length = head_resp.headers.get('content-length')
-            etag = head_resp.headers.get('etag')
-            last_modified = head_resp.headers.get('last-modified')
+            # Step 2: Content length and etag/last-modified for resume validation
+            content_length = range_info.get('content_length')
+            etag = range_info.get('etag')
+            last_modified = range_info.get('last_modified')
             
             if not content_length:
                 logger.info(f"Multi-connection: no content-length, using single connection")
@@ -312,9 +798,20 @@ class IntegratedMultiDownloader:
             elif total_size < min_size_threshold:
                 logger.info(f"Multi-connection: file too small ({total_size} bytes), using single connection")
                 return self._single_connection_download(url, destination, progress_callback, info)
-            else:
-                logger.info(f"Multi-connection: using {self.max_connections} connections for {total_size} bytes")
-                return self._multi_connection_download(url, destination, total_size, progress_callback, info, etag, last_modified)
+            
+            connections = self.max_connections
+            segment_size = None
+            # A download being resumed keeps the segment layout in its state file
+            if self.auto_tune and not os.path.exists(self._get_state_file_path(destination)):
+                connections = self._plan_connections(url, range_info.get('response_time') or 0)
+                if connections == 1:
+                    logger.info(f"Multi-connection: one connection saturates this link, using single connection")
+                    return self._single_connection_download(url, destination, progress_callback, info)
+                segment_size = self._plan_segment_size(url, total_size, connections)
+            
+            logger.info(f"Multi-connection: using {connections} connections for {total_size} bytes")
+            return self._multi_connection_download(url, destination, total_size, progress_callback, info,
+                                                   etag, last_modified, connections, segment_size)
                 
         except Exception as e:
             logger.error(f"Multi-connection: error during setup, falling back to single: {e}")
@@ -338,7 +835,9 @@ class IntegratedMultiDownloader:
             dm = DownloadManager(enable_multi_connection=False)  # Disable to prevent recursion
             
             logger.info(f"Single-connection: delegating to DownloadManager with resume support")
-            success = dm._basic_download(url, destination, progress_callback, resume=True, task_id=task_id)
+            # Hashed while streaming; the digest comes back in info['sha256']
+            success = dm._basic_download(url, destination, progress_callback, resume=True, task_id=task_id,
+                                         info=info)
             
             if success and os.path.exists(destination):
                 info['total_size'] = os.path.getsize(destination)
@@ -353,7 +852,7 @@ class IntegratedMultiDownloader:
         try:
             logger.info(f"Single-connection: downloading {url} (no resume support)")
             
-            response = requests.get(url, stream=True, allow_redirects=True, timeout=self.timeout)
+            response = self.session.get(url, stream=True, allow_redirects=True, timeout=self.timeout)
             response.raise_for_status()
             
             if not info['total_size']:
@@ -366,9 +865,11 @@ class IntegratedMultiDownloader:
             temp_file = f"{destination}.part"
             logger.info(f"ATOMIC | START | temp_file={temp_file} final_file={destination}")
             downloaded_bytes = 0
+            # Hashed as written, so verification needs no second pass over the file
+            hasher = hashlib.sha256()
             
             with open(temp_file, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
                     if chunk:
                         # Check for cancellation
                         if self.cancel_event.is_set():
@@ -383,6 +884,7 @@ class IntegratedMultiDownloader:
                             return False, info
                             
                         f.write(chunk)
+                        hasher.update(chunk)
                         downloaded_bytes += len(chunk)
                         
                         # Progress callback
@@ -396,8 +898,9 @@ class IntegratedMultiDownloader:
                         # STEP 1: Hash verification before atomic commit
             logger.info(f"HASH | START | {os.path.basename(destination)} | verifying SHA256 | temp={temp_file}")
             try:
-                calculated_hash = self._calculate_file_hash(temp_file)
+                calculated_hash = hasher.hexdigest()
                 logger.info(f"HASH | FINAL_OK | {os.path.basename(destination)} | sha256={calculated_hash[:16]}... | temp={temp_file}")
+                info['sha256'] = calculated_hash
             except Exception as hash_error:
                 logger.error(f"HASH | FINAL_FAIL | {os.path.basename(destination)} | error={hash_error} | temp={temp_file}")
                 raise hash_error
@@ -435,16 +938,24 @@ class IntegratedMultiDownloader:
     
     def _multi_connection_download(self, url: str, destination: str, total_size: int,
                                   progress_callback: Optional[Callable], info: Dict,
-                                  etag: str = None, last_modified: str = None) -> Tuple[bool, Dict]:
+                                  etag: str = None, last_modified: str = None,
+                                  connections: int = None, segment_size: int = None) -> Tuple[bool, Dict]:
         """Multi-connection download for Range-capable servers with resume support"""
         info['mode'] = 'multi'
-        info['connections_used'] = self.max_connections
+        connections = connections or self.max_connections
+        info['connections_used'] = connections
         
         # STEP 2: Atomic file handling - log atomic operation start
         temp_destination = f"{destination}.part"
         logger.info(f"ATOMIC | START | final={destination} | temp={temp_destination} | mode=multi")
+        direct_write = self.use_pwrite
+        shared_fd = None
         
         try:
+            # Part files, the temp file and the state all live beside the
+            # destination; its directory is created once, not per segment
+            os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+            
             task_id = f"dl_{int(time.time())}"
             # Check for existing state
             state = self._load_state(destination)
@@ -455,10 +966,22 @@ class IntegratedMultiDownloader:
                 task_id = state.get('task_id', task_id)  # Use existing task_id for resume
                 logger.info(f"RESUME | DETECTED | task_id={task_id} | state_file={self._get_state_file_path(destination)}")
                 
-                if self._validate_state_compatibility(state, url, total_size, etag, last_modified):
+                # A download keeps the layout it started with: part files, or
+                # in place (only resumable where pwrite exists)
+                resume_direct = bool(state.get('direct_write'))
+                if resume_direct and not hasattr(os, 'pwrite'):
+                    compatible = False
+                else:
+                    compatible = self._validate_state_compatibility(state, url, total_size, etag, last_modified)
+                
+                if compatible:
                     # STEP 3: Resume validation successful
                     logger.info(f"RESUME | VALIDATED | server_check=OK file_check=OK | task_id={task_id}")
-                    resume_segments = self._check_segment_completion(state['segments'])
+                    direct_write = resume_direct
+                    if direct_write:
+                        resume_segments = self._check_direct_write_progress(state['segments'], temp_destination)
+                    else:
+                        resume_segments = self._check_segment_completion(state['segments'])
                     segments = [(s['start'], s['end'], s['part_file'], s['id']) for s in resume_segments]
                     
                     # Log segment resume status
@@ -474,23 +997,35 @@ class IntegratedMultiDownloader:
                     task_id = f"dl_{int(time.time())}"  # Generate new task_id for fresh download
             
             if not state:
-                # Calculate new segments
-                segment_size = max(self.segment_size, total_size // self.max_connections)
+                # Calculate new segments: more segments than connections, so
+                # a slow range holds up one small segment rather than a
+                # 1/connections share of the file
+                # Rounded up so the last segment reaches the final byte
+                segment_size = max(segment_size or self.segment_size, -(-total_size // MAX_SEGMENTS))
                 segments = []
                 
-                for i in range(self.max_connections):
+                for i in range(-(-total_size // segment_size)):
                     start = i * segment_size
                     end = min((i + 1) * segment_size - 1, total_size - 1)
-                    if start > total_size - 1:
-                        break
-                        
-                    part_file = f"{destination}.part{i:03d}"
+                    
+                    part_file = temp_destination if direct_write else f"{destination}.part{i:03d}"
                     segments.append((start, end, part_file, i))
                 
                 # Save initial state
-                self._save_state(task_id, url, destination, total_size, segments, etag, last_modified)
+                self._save_state(task_id, url, destination, total_size, segments, etag, last_modified,
+                                 direct_write)
+            
+            info['connections_used'] = min(connections, len(segments))
+            part_files = [] if direct_write else [part_file for _, _, part_file, _ in segments]
             
-            part_files = [part_file for _, _, part_file, _ in segments]
+            if direct_write:
+                # Every segment writes its own byte range of one preallocated
+                # temp file, so there is nothing to merge afterwards
+                flags = os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+                if not resume_segments:
+                    flags |= os.O_TRUNC
+                shared_fd = os.open(temp_destination, flags, 0o644)
+                _preallocate(shared_fd, total_size)
             
             for i, (start, end, part_file, segment_id) in enumerate(segments):
                 info['segments_info'].append({
@@ -504,57 +1039,87 @@ class IntegratedMultiDownloader:
             logger.info(f"Multi-connection: using {len(segments)} segments")
             
             # Download segments in parallel
-            threads = []
             downloaders = []
+            resume_by_id = {s['id']: s for s in resume_segments} if resume_segments else {}
+            # If-Range needs a strong validator: a weak ETag may not be sent
+            validator = etag if etag and not etag.startswith('W/') else last_modified
+            # Proxy lookup reads the whole environment; do it once per download
+            pool = _segment_pool(url)
             
             for start, end, part_file, segment_id in segments:
                 # Determine resume offset
                 resume_from = 0
-                if resume_segments:
-                    for seg_state in resume_segments:
-                        if seg_state['id'] == segment_id:
-                            if seg_state['completed']:
-                                resume_from = seg_state['end'] - seg_state['start'] + 1  # Fully complete
-                            else:
-                                resume_from = seg_state['bytes_written']  # Partial
-                            break
+                seg_state = resume_by_id.get(segment_id)
+                if seg_state:
+                    if seg_state['completed']:
+                        resume_from = seg_state['end'] - seg_state['start'] + 1  # Fully complete
+                    else:
+                        resume_from = seg_state['bytes_written']  # Partial
                 
-                downloader = SegmentDownloader(url, start, end, part_file, segment_id, self.timeout, resume_from, self.cancel_event)
+                downloader = SegmentDownloader(url, start, end, part_file, segment_id, self.timeout, resume_from,
+                                               self.cancel_event, shared_fd, self._record_progress, validator,
+                                               self._abort_event, pool)
                 downloaders.append(downloader)
+            
+            # Progress already recorded in the state counts as flushed
+            self._last_flush_time = time.monotonic()
+            self._total_downloaded = self._flushed_bytes = sum(d.downloaded_bytes for d in downloaders)
+            self._abort_event.clear()
+            
+            # At most `connections` segments run at once; when there are more
+            # segments than that, a worker picks up the next queued segment
+            # as soon as it finishes one
+            with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="segment") as pool:
+                pending = [pool.submit(self._run_segment, d) for d in downloaders]
+                for future in pending:
+                    future.add_done_callback(self._notify_progress)
                 
-                thread = threading.Thread(target=downloader.download)
-                threads.append(thread)
-                thread.start()
-            
-            # Monitor progress
-            while any(t.is_alive() for t in threads):
-                if progress_callback:
-                    total_downloaded = sum(d.downloaded_bytes for d in downloaders)
-                    progress = (total_downloaded / total_size) * 100
-                    active_segments = sum(1 for d in downloaders if d.status == 'downloading')
+                # Monitor progress
+                reported = None
+                while pending:
+                    # Sleep until bytes arrive or a segment finishes
+                    with self._progress_cv:
+                        self._progress_cv.wait_for(
+                            lambda: self._total_downloaded != reported or any(f.done() for f in pending),
+                            timeout=PROGRESS_IDLE_INTERVAL)
+                        total_downloaded = self._total_downloaded
+                    reported = total_downloaded
                     
-                    progress_callback({
-                        'filename': os.path.basename(destination),
-                        'progress': f"{progress:.1f}%",
-                        'status': f'Downloading ({active_segments} connections active)'
-                    })
-                
-                time.sleep(0.5)
-            
-            # Wait for all threads to complete
-            for thread in threads:
-                thread.join()
+                    if progress_callback:
+                        progress = (total_downloaded / total_size) * 100
+                        active_segments = sum(1 for d in downloaders if d.status == 'downloading')
+                        
+                        progress_callback({
+                            'filename': os.path.basename(destination),
+                            'progress': f"{progress:.1f}%",
+                            'status': f'Downloading ({active_segments} connections active)'
+                        })
+                    
+                    if direct_write:
+                        self._maybe_save_state(task_id, url, destination, total_size, downloaders, shared_fd,
+                                               etag, last_modified)
+                    
+                    # Rate limit reports, but not at the expense of noticing completion
+                    _, pending = wait(pending, timeout=PROGRESS_MIN_INTERVAL, return_when=FIRST_COMPLETED)
             
             # Check if all segments succeeded
             failed_segments = [d for d in downloaders if d.status != 'completed']
             if failed_segments:
-                raise Exception(f"{len(failed_segments)} segments failed")
+                if direct_write and self.cancel_event.is_set():
+                    # Cancelled: the temp file and state are kept (see below) and
+                    # in-place progress is only known in memory, so record it for
+                    # a resume to continue each segment where it stopped. Failures
+                    # discard both and fall back, so there is nothing to save
+                    self._maybe_save_state(task_id, url, destination, total_size, downloaders, shared_fd,
+                                           etag, last_modified, force=True)
+                failed = sum(1 for d in failed_segments if d.status == 'failed')
+                raise Exception(f"{len(failed_segments)} segments incomplete ({failed} failed)")
             
             # Validate each part size equals expected size
             validated_segments = []
             for i, (start, end, part_file, segment_id) in enumerate(segments):
                 expected_size = end - start + 1
-                actual_size = os.path.getsize(part_file)
+                actual_size = downloaders[i].downloaded_bytes if direct_write else os.path.getsize(part_file)
                 if actual_size != expected_size:
                     raise Exception(f"Segment {segment_id}: size mismatch (expected {expected_size}, got {actual_size})")
                 
@@ -570,23 +1135,27 @@ class IntegratedMultiDownloader:
             
             # STEP 3: Save final validated state before merge
             logger.info(f"RESUME | SEGMENTS_VALIDATED | all_completed=true | task_id={task_id}")
-            self._save_state(task_id, url, destination, total_size, validated_segments, etag, last_modified)
+            self._save_state(task_id, url, destination, total_size, validated_segments, etag, last_modified,
+                             direct_write)
 
-            # Merge segments into final file using streaming chunks
-            logger.info("Multi-connection: merging segments")
             temp_file = f"{destination}.part"
-            logger.info(f"ATOMIC | START | temp_file={temp_file} final_file={destination}")
-            
-            merged_size = 0
-            with open(temp_file, 'wb') as outfile:
-                for _, _, part_file, _ in segments:
-                    with open(part_file, 'rb') as infile:
-                        while True:
-                            chunk = infile.read(8192)
-                            if not chunk:
-                                break
-                            outfile.write(chunk)
-                            merged_size += len(chunk)
+            if direct_write:
+                os.close(shared_fd)
+                shared_fd = None
+                merged_size = sum(d.downloaded_bytes for d in downloaders)
+            else:
+                # Merge segments into final file using streaming chunks
+                logger.info("Multi-connection: merging segments")
+                logger.info(f"ATOMIC | START | temp_file={temp_file} final_file={destination}")
+                
+                with open(temp_file, 'wb') as outfile:
+                    _preallocate(outfile.fileno(), total_size)
+                
+                # Each part lands at its own offset, so parts are copied concurrently
+                with ThreadPoolExecutor(max_workers=min(len(segments), connections)) as pool:
+                    merged_size = sum(pool.map(
+                        lambda seg: _merge_part(seg[2], temp_file, seg[0], seg[1] - seg[0] + 1),
+                        segments))
             
             # Validate merged temp file size == total_size before finalize
             if merged_size != total_size:
@@ -611,7 +1180,8 @@ class IntegratedMultiDownloader:
                 os.remove(state_file)
                 logger.info("Removed download state file after successful completion")
             
-            logger.info(f"Multi-connection: completed {total_size} bytes using {len(segments)} connections")
+            logger.info(f"Multi-connection: completed {total_size} bytes using {len(segments)} segments "
+                        f"over {info['connections_used']} connections")
             
             # STEP 3: Cleanup resume state on successful completion 
             self._cleanup_resume_state(destination, task_id)
@@ -628,6 +1198,8 @@ class IntegratedMultiDownloader:
         except Exception as e:
             # Check if this was a cancellation
             if self.cancel_event.is_set():
+                if shared_fd is not None:
+                    os.close(shared_fd)
                 logger.info("Multi-connection: Download cancelled by user")
                 # Preserve part files and state file for resume
                 info['mode'] = 'cancelled'
@@ -637,9 +1209,15 @@ class IntegratedMultiDownloader:
             
             # Cleanup temp file on non-cancel failure, but keep part files for potential resume
             temp_file = f"{destination}.part"
+            if shared_fd is not None:
+                os.close(shared_fd)
+                shared_fd = None
             if os.path.exists(temp_file):
                 os.remove(temp_file)
                 logger.warning(f"ATOMIC | COMMIT_FAIL | removed temp_file={temp_file} reason=error error={e}")
+            if direct_write:
+                # The state describes progress held in the temp file just removed
+                self._cleanup_resume_state(destination, task_id)
                 
             # Only remove part files if they are corrupted, not on normal failure
             # (This allows resume to work with partial downloads)
@@ -652,8 +1230,10 @@ class IntegratedMultiDownloader:
 
     def _calculate_file_hash(self, filepath: str) -> str:
         """Calculate SHA256 hash of a file for integrity verification"""
-        sha256_hash = hashlib.sha256()
         with open(filepath, "rb") as f:
-            for byte_block in iter(lambda: f.read(8192), b""):
+            if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            sha256_hash = hashlib.sha256()
+            for byte_block in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
\ No newline at end of file
@@ -6,27 +6,83 @@ Provides aria2-like remote control interface for automation
 import json
 import threading
 import time
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import logging
 from typing import Dict, Any, Optional, List
 from advanced_download_manager import AdvancedDownloadManager
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _loads_json(data: bytes) -> Any:
+    """Parse a JSON request body, via orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def _dumps_json(obj, indent: bool = False) -> bytes:
+    """Serialize a response body to UTF-8 JSON, via orjson when installed"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else None)
+    return json.dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+# API description served on GET /jsonrpc; it never changes, so it is
+# serialized once here rather than per request
+_API_DOC_BYTES = _dumps_json({
+    "name": "NGK's Download Manager API",
+    "version": "2.0",
+    "methods": [
+        "aria2.addUri",
+        "aria2.remove",
+        "aria2.pause",
+        "aria2.unpause",
+        "aria2.tellStatus",
+        "aria2.tellActive",
+        "aria2.tellWaiting",
+        "aria2.tellStopped",
+        "aria2.getGlobalStat",
+        "aria2.getGlobalOption",
+        "aria2.changeGlobalOption"
+    ]
+}, indent=True)
+
+# Internal download status -> aria2 status
+_STATUS_MAP = {
+    'starting': 'waiting',
+    'downloading': 'active',
+    'completed': 'complete',
+    'failed': 'error',
+    'cancelled': 'removed',
+    'paused': 'paused'
+}
+
 class JSONRPCHandler(BaseHTTPRequestHandler):
     """HTTP handler for JSON-RPC requests"""
     
-    def __init__(self, *args, download_manager=None, **kwargs):
-        self.download_manager = download_manager
-        super().__init__(*args, **kwargs)
+    # Buffer wfile so the headers and the JSON body go out in one send();
+    # BaseHTTPRequestHandler flushes it after every request
+    wbufsize = 64 * 1024
+    
+    # TCP_NODELAY on accepted connections (set by StreamRequestHandler.setup)
+    disable_nagle_algorithm = True
+    
+    def setup(self):
+        super().setup()
+        # Shared through the server, so no per-connection handler factory
+        self.download_manager = self.server.download_manager
     
     def do_POST(self):
         """Handle POST requests (JSON-RPC calls)"""
         try:
             content_length = int(self.headers.get('Content-Length', 0))
-            post_data = self.rfile.read(content_length).decode('utf-8')
+            post_data = self.rfile.read(content_length)
             
-            # Parse JSON-RPC request
-            request = json.loads(post_data)
+            # Parse JSON-RPC request (straight from the UTF-8 bytes)
+            request = _loads_json(post_data)
             
             # Process request
             response = self.process_rpc_request(request)
@@ -37,7 +93,7 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            self.wfile.write(json.dumps(response).encode('utf-8'))
+            self.wfile.write(_dumps_json(response))
             
         except Exception as e:
             self.send_error_response(str(e))
@@ -52,25 +108,7 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
             self.send_header('Content-Type', 'application/json')
             self.end_headers()
             
-            api_doc = {
-                "name": "NGK's Download Manager API",
-                "version": "2.0",
-                "methods": [
-                    "aria2.addUri",
-                    "aria2.remove",
-                    "aria2.pause",
-                    "aria2.unpause",
-                    "aria2.tellStatus",
-                    "aria2.tellActive",
-                    "aria2.tellWaiting",
-                    "aria2.tellStopped",
-                    "aria2.getGlobalStat",
-                    "aria2.getGlobalOption",
-                    "aria2.changeGlobalOption"
-                ]
-            }
-            
-            self.wfile.write(json.dumps(api_doc, indent=2).encode('utf-8'))
+            self.wfile.write(_API_DOC_BYTES)
         else:
             self.send_error(404)
     
@@ -97,28 +135,25 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
                 "id": request_id
             }
     
+    # RPC method name -> handler method name
+    _METHODS = {
+        'aria2.addUri': 'add_uri',
+        'aria2.remove': 'remove_download',
+        'aria2.pause': 'pause_download',
+        'aria2.tellStatus': 'tell_status',
+        'aria2.tellActive': 'tell_active',
+        'aria2.tellWaiting': 'tell_waiting',
+        'aria2.getGlobalStat': 'get_global_stat',
+        'aria2.getGlobalOption': 'get_global_option',
+        'aria2.changeGlobalOption': 'change_global_option',
+    }
+    
     def handle_method(self, method: str, params: List) -> Any:
         """Handle specific RPC methods"""
-        if method == 'aria2.addUri':
-            return self.add_uri(params)
-        elif method == 'aria2.remove':
-            return self.remove_download(params)
-        elif method == 'aria2.pause':
-            return self.pause_download(params)
-        elif method == 'aria2.tellStatus':
-            return self.tell_status(params)
-        elif method == 'aria2.tellActive':
-            return self.tell_active(params)
-        elif method == 'aria2.tellWaiting':
-            return self.tell_waiting(params)
-        elif method == 'aria2.getGlobalStat':
-            return self.get_global_stat(params)
-        elif method == 'aria2.getGlobalOption':
-            return self.get_global_option(params)
-        elif method == 'aria2.changeGlobalOption':
-            return self.change_global_option(params)
-        else:
+        handler = self._METHODS.get(method) if isinstance(method, str) else None
+        if handler is None:
             raise Exception(f"Unknown method: {method}")
+        return getattr(self, handler)(params)
     
     def add_uri(self, params: List) -> str:
         """Add a new download (aria2.addUri)"""
@@ -202,12 +237,16 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
         stats = self.download_manager.get_stats()
         active = self.download_manager.get_active_downloads()
         
-        downloading_count = sum(1 for status in active.values() 
-                              if status['status'] == 'downloading')
+        # Speed and active count in one pass over the downloads
+        total_speed = 0
+        downloading_count = 0
+        for status in active.values():
+            total_speed += status.get('speed', 0)
+            if status['status'] == 'downloading':
+                downloading_count += 1
         
         return {
-            "downloadSpeed": str(int(sum(status.get('speed', 0) 
-                                       for status in active.values()))),
+            "downloadSpeed": str(int(total_speed)),
             "uploadSpeed": "0",
             "numActive": str(downloading_count),
             "numWaiting": "0",
@@ -305,15 +344,7 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
     
     def map_status_to_aria2(self, status: str) -> str:
         """Map internal status to aria2 status"""
-        mapping = {
-            'starting': 'waiting',
-            'downloading': 'active',
-            'completed': 'complete',
-            'failed': 'error',
-            'cancelled': 'removed',
-            'paused': 'paused'
-        }
-        return mapping.get(status, 'unknown')
+        return _STATUS_MAP.get(status, 'unknown')
     
     def send_error_response(self, error_msg: str):
         """Send error response"""
@@ -330,7 +361,7 @@ class JSONRPCHandler(BaseHTTPRequestHandler):
             "id": None
         }
         
-        self.wfile.write(json.dumps(error_response).encode('utf-8'))
+        self.wfile.write(_dumps_json(error_response))
     
     def log_message(self, format, *args):
         """Override to use our logging"""
@@ -347,6 +378,8 @@ class JSONRPCServer:
         self.server = None
         self.thread = None
         self.running = False
+        # Cleared by the serve thread itself when serve_forever returns
+        self._serving = False
         
         self.logger = logging.getLogger(__name__)
     
@@ -355,15 +388,15 @@ class JSONRPCServer:
         if self.running:
             return
         
-        # Create server with download manager reference
-        def handler(*args, **kwargs):
-            return JSONRPCHandler(*args, download_manager=self.download_manager, **kwargs)
-        
         try:
-            self.server = HTTPServer((self.host, self.port), handler)
+            # One thread per connection, so a slow client or a call that
+            # blocks in the download manager does not hold up other RPCs
+            self.server = ThreadingHTTPServer((self.host, self.port), JSONRPCHandler)
+            self.server.download_manager = self.download_manager
             self.running = True
             
             # Start in separate thread
+            self._serving = True
             self.thread = threading.Thread(target=self._run_server, daemon=True)
             self.thread.start()
             
@@ -396,10 +429,12 @@ class JSONRPCServer:
         except Exception as e:
             if self.running:  # Only log if we weren't stopped intentionally
                 self.logger.error(f"Server error: {e}")
+        finally:
+            self._serving = False
     
     def is_running(self) -> bool:
         """Check if server is running"""
-        return self.running and self.thread and self.thread.is_alive()
+        return self.running and self._serving
 
 # Example usage and testing functions
 def test_rpc_server():
@@ -5,18 +5,33 @@ Provides a deterministic HTTP server with Range request support
 
 import os
 import socket
+import stat
 import threading
 import time
 import hashlib
 import tempfile
 import shutil
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import unquote
 
+# Bytes handed to os.sendfile per call; slow mode is re-checked between calls
+SENDFILE_CHUNK = 1024 * 1024
+
+# Read size of the copy loop used without sendfile; slow mode sends
+# SLOW_CHUNK bytes per 10 ms instead
+COPY_CHUNK = 256 * 1024
+SLOW_CHUNK = 8192
+
+# How often serve_forever checks for shutdown(); bounds how long stop() blocks
+SHUTDOWN_POLL_INTERVAL = 0.05
+
 
 class RangeHTTPRequestHandler(BaseHTTPRequestHandler):
     """HTTP handler with /range/ and /norange/ endpoints"""
 
+    # TCP_NODELAY on accepted connections (set by StreamRequestHandler.setup)
+    disable_nagle_algorithm = True
+
     def log_message(self, format, *args):
         """Override to suppress request logs"""
         pass
@@ -38,17 +53,26 @@ class RangeHTTPRequestHandler(BaseHTTPRequestHandler):
         """Get the actual file path for a filename"""
         return os.path.join(self.server.serve_dir, filename)
 
+    def _stat_file(self, file_path):
+        """Stat a served file once per request; None if it is not a regular file"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return None
+        return st if stat.S_ISREG(st.st_mode) else None
+
     def do_HEAD(self):
         """Handle HEAD requests"""
         mode, filename = self.parse_request_path(self.path)
         file_path = self.get_file_path(filename)
 
-        if not os.path.exists(file_path) or not os.path.isfile(file_path):
+        st = self._stat_file(file_path)
+        if st is None:
             self.send_error(404, "File not found")
             return
 
-        file_size = os.path.getsize(file_path)
-        file_mtime = int(os.path.getmtime(file_path))
+        file_size = st.st_size
+        file_mtime = int(st.st_mtime)
 
         self.send_response(200)
         self.send_header("Content-Length", str(file_size))
@@ -67,12 +91,13 @@ class RangeHTTPRequestHandler(BaseHTTPRequestHandler):
         mode, filename = self.parse_request_path(self.path)
         file_path = self.get_file_path(filename)
 
-        if not os.path.exists(file_path) or not os.path.isfile(file_path):
+        st = self._stat_file(file_path)
+        if st is None:
             self.send_error(404, "File not found")
             return
 
-        file_size = os.path.getsize(file_path)
-        file_mtime = int(os.path.getmtime(file_path))
+        file_size = st.st_size
+        file_mtime = int(st.st_mtime)
 
         # Range support depends on endpoint AND server no-range mode
         range_header = self.headers.get("Range")
@@ -153,19 +178,33 @@ class RangeHTTPRequestHandler(BaseHTTPRequestHandler):
         """Send a range of bytes from a file with optional delay for testing"""
         try:
             with open(file_path, "rb") as f:
-                f.seek(start)
+                offset = start
                 remaining = end - start + 1
-                chunk_size = 8192
+
+                # Copy from the page cache straight to the socket; slow mode
+                # uses the throttled loop below
+                if hasattr(os, "sendfile"):
+                    out_fd = self.connection.fileno()
+                    while remaining > 0 and not getattr(self.server, "slow_mode", False):
+                        sent = os.sendfile(out_fd, f.fileno(), offset, min(remaining, SENDFILE_CHUNK))
+                        if not sent:
+                            break
+                        offset += sent
+                        remaining -= sent
+
+                f.seek(offset)
+                # One buffer for the whole range instead of a bytes object per read
+                view = memoryview(bytearray(min(COPY_CHUNK, max(remaining, 0))))
 
                 while remaining > 0:
-                    n = min(chunk_size, remaining)
-                    data = f.read(n)
-                    if not data:
+                    slow_mode = getattr(self.server, "slow_mode", False)
+                    n = f.readinto(view[:min(SLOW_CHUNK if slow_mode else COPY_CHUNK, remaining)])
+                    if not n:
                         break
-                    self.wfile.write(data)
-                    remaining -= len(data)
+                    self.wfile.write(view[:n])
+                    remaining -= n
 
-                    if getattr(self.server, "slow_mode", False):
+                    if slow_mode:
                         time.sleep(0.01)  # 10ms per chunk
         except Exception:
             # Client may disconnect; ignore
@@ -215,7 +254,9 @@ class LocalRangeServer:
         # Ensure directory is prepared
         self.setup_serve_directory()
 
-        self.server = HTTPServer(("localhost", self.port), RangeHTTPRequestHandler)
+        # One (daemon) thread per connection, so the segments of a
+        # multi-connection download are served in parallel
+        self.server = ThreadingHTTPServer(("localhost", self.port), RangeHTTPRequestHandler)
         self.server.serve_dir = self.serve_dir
         self.server.slow_mode = False
         self.server.no_range_mode = self._no_range_mode
@@ -223,10 +264,15 @@ class LocalRangeServer:
         self.actual_port = self.server.server_address[1]
         self.base_url = f"http://localhost:{self.actual_port}"
 
-        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        # The socket is already bound and listening, so clients that connect
+        # before serve_forever runs wait in the backlog; no startup delay needed
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            kwargs={"poll_interval": SHUTDOWN_POLL_INTERVAL},
+            daemon=True,
+        )
         self.thread.start()
 
-        time.sleep(0.1)
         return self.base_url, self.serve_dir
 
     def stop(self):
@@ -262,12 +308,15 @@ class LocalRangeServer:
         # Create predictable content for hash verification
         pattern = (b"ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789" * 29)[:1024]  # 1KB
 
+        # Written in blocks of up to 16 MiB of the pattern (a whole number
+        # of repetitions, so every block continues the pattern exactly)
+        block = pattern * -(-min(size_bytes, 16 * 1024 * 1024) // len(pattern))
+        view = memoryview(block)
         written = 0
         with open(file_path, "wb") as f:
             while written < size_bytes:
-                remaining = size_bytes - written
-                chunk_size = min(len(pattern), remaining)
-                f.write(pattern[:chunk_size])
+                chunk_size = min(len(block), size_bytes - written)
+                f.write(view[:chunk_size])
                 written += chunk_size
 
         return file_path
@@ -281,9 +330,11 @@ class LocalRangeServer:
         if not os.path.exists(file_path):
             return None
 
-        sha256_hash = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
+            if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                return hashlib.file_digest(f, 'sha256').hexdigest()
+            sha256_hash = hashlib.sha256()
+            for byte_block in iter(lambda: f.read(1024 * 1024), b""):
                 sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Enhanced Queue Tests - condition evaluation and waiter wake-ups
+Deterministic, headless, offline.
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from enhanced_queue_manager import (
+    DownloadCondition,
+    DownloadConditionType,
+    EnhancedQueueManager,
+    create_time_condition,
+)
+
+# Size/custom waiters are swept every 5 seconds; event-driven wake-ups must
+# land well inside that
+SWEEP_INTERVAL = 5.0
+
+
+def _wait_until(predicate, timeout):
+    """Poll predicate until true; returns the elapsed time or None on timeout"""
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        if predicate():
+            return time.monotonic() - started
+        time.sleep(0.01)
+    return None
+
+
+def test_dependency_condition_tracks_context():
+    """A memoized dependency condition must follow the context it is given"""
+    condition = DownloadCondition(DownloadConditionType.DEPENDENCY_BASED,
+                                  {'requires_completed': ['a']})
+
+    # Same set size, different members: the cached result must not be reused
+    assert condition.evaluate({'completed_downloads': {'b'}}) is False
+    assert condition.evaluate({'completed_downloads': {'a'}}) is True
+    assert condition.evaluate({'completed_downloads': {'b'}}) is False
+
+
+def test_dependency_condition_blocks_on_failure():
+    """blocks_if_failed is re-evaluated when a different task has failed"""
+    condition = DownloadCondition(DownloadConditionType.DEPENDENCY_BASED,
+                                  {'blocks_if_failed': ['a']})
+
+    assert condition.evaluate({'failed_downloads': {'b'}}) is True
+    assert condition.evaluate({'failed_downloads': {'a'}}) is False
+    assert condition.evaluate({'failed_downloads': set()}) is True
+
+
+def test_dependency_released_on_complete_download():
+    """A dependent task starts as soon as its dependency completes"""
+    qm = EnhancedQueueManager()
+    qm.start()
+    try:
+        parent = qm.add_download("http://example.invalid/parent.bin", "/tmp/parent.bin")
+        assert _wait_until(lambda: parent in qm.active_downloads, 2) is not None
+
+        child = qm.add_download("http://example.invalid/child.bin", "/tmp/child.bin",
+                                dependencies=[parent])
+        # Parked as a dependency waiter, not swept with size/custom waiters
+        assert _wait_until(lambda: any(t.task_id == child for t in qm._dep_waiters), 2) is not None
+        time.sleep(0.2)
+        assert child not in qm.active_downloads
+
+        qm.complete_download(parent)
+        elapsed = _wait_until(lambda: child in qm.active_downloads, SWEEP_INTERVAL)
+        assert elapsed is not None and elapsed < 1.0
+        assert parent in qm.completed_downloads
+    finally:
+        qm.stop()
+
+
+def test_time_condition_wakes_without_polling():
+    """A task gated on a start time is released at that time, not on a sweep"""
+    qm = EnhancedQueueManager()
+    qm.start()
+    try:
+        # Let the checker finish its startup sweep so only the time heap can
+        # release the task
+        time.sleep(0.2)
+        start_at = datetime.now() + timedelta(seconds=0.6)
+        task_id = qm.add_download("http://example.invalid/later.bin", "/tmp/later.bin",
+                                  conditions=[create_time_condition(start_time=start_at.isoformat())])
+
+        with qm.lock:
+            wake_at = [entry[0] for entry in qm._time_waiters if entry[-1].task_id == task_id]
+        assert wake_at == [start_at.timestamp()]
+        assert qm.waiting_queue.empty()
+
+        assert _wait_until(lambda: task_id in qm.active_downloads, SWEEP_INTERVAL) is not None
+        released = datetime.now()
+        assert released >= start_at
+        assert (released - start_at).total_seconds() < 1.0
+    finally:
+        qm.stop()
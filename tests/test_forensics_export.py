@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Forensics Export Tests - export archive writing
+Deterministic, headless, offline.
+"""
+
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import types
+import zipfile
+import zlib
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import forensics_exporter
+
+
+def _load_exporter_with_fake_isal(calls):
+    """Load a private copy of forensics_exporter that sees an isal module
+
+    The fake isal_zlib hands out stdlib compressors (same raw deflate
+    stream) and records each request, so the ISA-L path runs without isal.
+    """
+    def compressobj(level, method, wbits):
+        calls.append((level, method, wbits))
+        return zlib.compressobj(level, method, wbits)
+
+    fake_zlib = types.SimpleNamespace(compressobj=compressobj, DEFLATED=zlib.DEFLATED)
+    fake_isal = types.ModuleType('isal')
+    fake_isal.isal_zlib = fake_zlib
+    saved = {name: sys.modules.get(name) for name in ('isal', 'isal.isal_zlib')}
+    sys.modules['isal'] = fake_isal
+    sys.modules['isal.isal_zlib'] = fake_zlib
+    try:
+        spec = importlib.util.spec_from_file_location(
+            '_forensics_exporter_isal', os.path.join(ROOT, 'forensics_exporter.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = value
+    return module
+
+
+def test_isal_export_zip_reads_back_with_stdlib(tmp_path):
+    """Archives deflated through the ISA-L hook are valid for stdlib zipfile"""
+    calls = []
+    exporter = _load_exporter_with_fake_isal(calls)
+    assert exporter.ISAL_AVAILABLE
+
+    payload = b''.join(b'line %d of the diagnostic log\n' % i for i in range(20000))
+    path = tmp_path / 'pack.zip'
+    with exporter._ExportZipFile(path, 'w', zipfile.ZIP_DEFLATED,
+                                 compresslevel=exporter._ZIP_COMPRESSLEVEL) as zf:
+        zf.writestr('logs/app.log', payload)
+        zf.writestr('state.json', b'{}', compress_type=zipfile.ZIP_STORED)
+
+    # The deflated entry went through the hook, the stored one did not
+    assert calls == [(exporter._ZIP_COMPRESSLEVEL, zlib.DEFLATED, -15)]
+
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        info = zf.getinfo('logs/app.log')
+        assert info.compress_type == zipfile.ZIP_DEFLATED
+        assert info.compress_size < len(payload)
+        assert zf.read('logs/app.log') == payload
+        assert zf.read('state.json') == b'{}'
+
+
+def test_export_timestamp_is_cleared_after_export(tmp_path, monkeypatch):
+    """The export start time only stamps the export that set it"""
+    monkeypatch.chdir(tmp_path)
+    exporter = forensics_exporter.ForensicsExporter()
+    exporter.export_base_path = tmp_path / 'exports'
+
+    seen = []
+    render = exporter._render_build_metadata
+    monkeypatch.setattr(exporter, '_render_build_metadata',
+                        lambda: seen.append(exporter._export_started_at) or render())
+
+    path = exporter.export_diagnostic_pack()
+    assert zipfile.ZipFile(path).testzip() is None
+    assert seen and seen[0] is not None
+    assert exporter._export_started_at is None
+
+
+def _git(cwd, *args):
+    return subprocess.check_output(['git', *args], cwd=cwd, stderr=subprocess.DEVNULL).decode().strip()
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git not installed')
+def test_read_git_info_in_worktree_with_packed_refs(tmp_path, monkeypatch):
+    """A linked worktree resolves its branch through commondir and packed-refs"""
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    _git(repo, 'init', '-q', '-b', 'main')
+    _git(repo, '-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '-q',
+         '--allow-empty', '-m', 'init')
+    _git(repo, 'worktree', 'add', '-q', '-b', 'feature', str(tmp_path / 'wt'))
+    _git(repo, 'pack-refs', '--all')
+    sha = _git(repo, 'rev-parse', 'HEAD')
+    assert (tmp_path / 'wt' / '.git').is_file()
+    assert not (repo / '.git' / 'refs' / 'heads' / 'feature').exists()
+
+    # Must be answered from the files alone
+    monkeypatch.setattr(forensics_exporter, '_git_rev_parse',
+                        lambda *args: pytest.fail('fell back to git'))
+    monkeypatch.chdir(tmp_path / 'wt')
+    assert forensics_exporter._read_git_info.__wrapped__() == (sha, 'feature')
+    monkeypatch.chdir(repo)
+    assert forensics_exporter._read_git_info.__wrapped__() == (sha, 'main')
+
+
+def test_read_git_info_falls_back_outside_a_checkout(tmp_path, monkeypatch):
+    """Without a readable .git the answer comes from git rev-parse"""
+    calls = []
+    monkeypatch.setattr(forensics_exporter, '_git_rev_parse',
+                        lambda *args: calls.append(args) or 'unknown')
+    monkeypatch.chdir(tmp_path)
+    assert forensics_exporter._read_git_info.__wrapped__() == ('unknown', 'unknown')
+    assert calls == [('HEAD',), ('--abbrev-ref', 'HEAD')]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Multi-Connection Resume Tests - in-place (pwrite) downloads
+
+Proves:
+  A. A cancelled in-place download keeps its temp file and a checkpoint
+  B. The resume continues each segment where the checkpoint left it
+  C. A transient segment failure during the resume is retried in place
+  D. The finished file is byte-identical to the source
+
+Deterministic, headless, offline.
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import integrated_multi_downloader as imd
+from integrated_multi_downloader import IntegratedMultiDownloader
+from local_range_server import LocalRangeServer
+
+FILE_SIZE = 12 * 1024 * 1024 + 123  # Above the multi-connection threshold
+
+
+class _FailOnce:
+    """Pool wrapper that fails the first request for one byte offset"""
+
+    def __init__(self, pool, fail_start):
+        self.pool = pool
+        self.fail_start = fail_start
+        self.ranges = []
+
+    def request(self, method, url, headers=None, **kw):
+        start = int(headers['Range'][len('bytes='):].split('-')[0])
+        self.ranges.append(start)
+        if start == self.fail_start and self.ranges.count(start) == 1:
+            raise ConnectionError('connection reset by peer')
+        return self.pool.request(method, url, headers=headers, **kw)
+
+
+def test_in_place_resume_after_cancel(tmp_path, monkeypatch):
+    """Cancel an in-place download mid-way, resume it, get the exact bytes"""
+    server = LocalRangeServer()
+    base_url, serve_dir = server.start()
+    try:
+        data = os.urandom(FILE_SIZE)
+        with open(os.path.join(serve_dir, 'big.bin'), 'wb') as f:
+            f.write(data)
+        url = f"{base_url}/range/big.bin"
+        dest = str(tmp_path / 'big.bin')
+        state_path = f"{dest}.downloadstate.json"
+
+        # A. Cancel while segments are part-way through their ranges
+        server.set_slow_mode(True)
+        first = IntegratedMultiDownloader(max_connections=4, use_pwrite=True, auto_tune=False)
+        progressed = threading.Event()
+        result = {}
+
+        def on_progress(update):
+            if update['progress'] not in ('0.0%', '100%'):
+                progressed.set()
+
+        worker = threading.Thread(
+            target=lambda: result.update(zip(('ok', 'info'), first.download(url, dest, on_progress))))
+        worker.start()
+        assert progressed.wait(30), "no progress before cancelling"
+        first.cancel_download()
+        worker.join(30)
+        assert not worker.is_alive()
+        server.set_slow_mode(False)
+
+        assert result['ok'] is False
+        assert result['info']['mode'] == 'cancelled'
+        assert os.path.exists(f"{dest}.part")
+        with open(state_path) as f:
+            state = json.load(f)
+        assert state['direct_write'] is True
+        assert 0 < state['bytes_completed'] < FILE_SIZE
+        partial = [s for s in state['segments'] if 0 < s['bytes_written'] < s['end'] - s['start'] + 1]
+        assert partial, "expected a segment stopped mid-range"
+
+        # C. The first resumed request of a partial segment fails once
+        segment = partial[0]
+        resume_offset = segment['start'] + segment['bytes_written']
+        pool = _FailOnce(imd._segment_pool(url), resume_offset)
+        monkeypatch.setattr(imd, '_segment_pool', lambda _url: pool)
+        monkeypatch.setattr(imd, 'SEGMENT_RETRY_BASE_DELAY', 0.01)
+        # Any failure must surface instead of being hidden by the fallback
+        monkeypatch.setattr(IntegratedMultiDownloader, '_single_connection_download',
+                            lambda self, *a, **k: (False, {'mode': 'fallback'}))
+
+        # B. Resume: each segment restarts from its checkpointed offset
+        ok, info = IntegratedMultiDownloader(max_connections=4, use_pwrite=True,
+                                             auto_tune=False).download(url, dest)
+        assert ok, info
+        assert info['mode'] == 'multi'
+        assert pool.ranges.count(resume_offset) == 2  # failed once, retried once
+        for seg in state['segments']:
+            if seg['bytes_written'] == seg['end'] - seg['start'] + 1:
+                assert seg['start'] not in pool.ranges  # finished segments are not refetched
+            elif seg['bytes_written']:
+                assert seg['start'] + seg['bytes_written'] in pool.ranges
+
+        # D. Same bytes as the source; nothing left behind for another resume
+        with open(dest, 'rb') as f:
+            assert hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest()
+        assert not os.path.exists(f"{dest}.part")
+        assert not os.path.exists(state_path)
+    finally:
+        server.stop()
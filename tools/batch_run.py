@@ -101,9 +101,11 @@ def build_log_folder(base: str, mode: str, summary: Dict[str, int],
 def _sha256_file(path: str) -> Optional[str]:
     """Compute SHA-256 hex digest of a file. Returns None on error."""
     try:
-        h = hashlib.sha256()
         with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(8192), b""):
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, "sha256").hexdigest()
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 h.update(chunk)
         return h.hexdigest()
     except Exception:
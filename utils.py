@@ -407,9 +407,11 @@ class FileUtils:
         import hashlib
         
         try:
-            hash_obj = hashlib.new(algorithm)
             with open(filepath, 'rb') as f:
-                for chunk in iter(lambda: f.read(4096), b""):
+                if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                    return hashlib.file_digest(f, algorithm).hexdigest()
+                hash_obj = hashlib.new(algorithm)
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
                     hash_obj.update(chunk)
             return hash_obj.hexdigest()
         except Exception as e:
@@ -11,11 +11,23 @@ import hashlib
 import json
 import logging
 from urllib.parse import urlparse
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
 from typing import Dict, List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import socket
 
+# Default read size for responses and segment merges (1 MiB): large reads keep
+# per-chunk interpreter and syscall overhead out of the transfer loops
+IO_CHUNK = 1 << 20
+
+# Segments wake the progress monitor after this many new bytes (or when they
+# finish or fail); it reports at most every PROGRESS_MIN_INTERVAL seconds and
+# at least every PROGRESS_HEARTBEAT seconds
+PROGRESS_NOTIFY_BYTES = 256 * 1024
+PROGRESS_MIN_INTERVAL = 0.25
+PROGRESS_HEARTBEAT = 1.0
+
 @dataclass
 class SegmentState:
     """Represents the state of a download segment"""
@@ -38,16 +50,48 @@ class SegmentState:
 class ServerCapability:
     """Detects and validates server capabilities for multi-connection downloads"""
     
+    CACHE_MAX_ENTRIES = 256
+    CACHE_TTL_SECONDS = 300
+    
     def __init__(self):
         self.logger = logging.getLogger(f"{__name__}.ServerCapability")
+        # url -> (checked_at, supports_multi, capability_info)
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+    
+    def clear_cache(self):
+        """Forget cached capability results"""
+        with self._cache_lock:
+            self._cache.clear()
     
     def check_multi_connection_support(self, url: str) -> Tuple[bool, Dict]:
         """
         Explicitly check if server supports multi-connection downloads
         
+        Successful checks are cached per URL for CACHE_TTL_SECONDS, so
+        repeated downloads of the same resource skip the HEAD round trip.
+        
         Returns:
             (supports_multi_conn, capability_info)
         """
+        with self._cache_lock:
+            cached = self._cache.get(url)
+            if cached and time.monotonic() - cached[0] <= self.CACHE_TTL_SECONDS:
+                self._cache.move_to_end(url)
+                self.logger.info(f"Using cached server capabilities for: {url}")
+                return cached[1], dict(cached[2])
+        
+        supports_multi, capability_info = self._check_multi_connection_support(url)
+        if 'error' not in capability_info:
+            with self._cache_lock:
+                self._cache[url] = (time.monotonic(), supports_multi, dict(capability_info))
+                self._cache.move_to_end(url)
+                while len(self._cache) > self.CACHE_MAX_ENTRIES:
+                    self._cache.popitem(last=False)
+        return supports_multi, capability_info
+    
+    def _check_multi_connection_support(self, url: str) -> Tuple[bool, Dict]:
+        """Query the server with a HEAD request"""
         self.logger.info(f"Checking server capabilities for: {url}")
         
         try:
@@ -102,11 +146,16 @@ class SegmentCoordinator:
         self.max_connections = min(max_connections, 8)  # Cap at 8
         self.segments: List[SegmentState] = []
         self.lock = threading.RLock()
+        self.changed = threading.Condition(self.lock)
+        self.abort_event = threading.Event()  # Set by the first failed segment
+        self._changed = False
+        self._unreported_bytes = 0
         self.logger = logging.getLogger(f"{__name__}.SegmentCoordinator")
         
         # Performance tracking
         self.active_connections = 0
         self.completed_segments = 0
+        self.total_downloaded = 0  # Sum of segment downloaded_bytes
         self.stall_timeout = 30.0  # seconds
         
         self._create_segments()
@@ -146,6 +195,9 @@ class SegmentCoordinator:
     def get_next_segment(self, thread_id: str) -> Optional[SegmentState]:
         """Get next available segment for download"""
         with self.lock:
+            if self.abort_event.is_set():
+                return None
+            
             for segment in self.segments:
                 if segment.status == 'pending':
                     segment.status = 'downloading'
@@ -164,8 +216,13 @@ class SegmentCoordinator:
         with self.lock:
             if segment_id < len(self.segments):
                 segment = self.segments[segment_id]
+                delta = downloaded_bytes - segment.downloaded_bytes
+                self.total_downloaded += delta
+                self._unreported_bytes += delta
                 segment.downloaded_bytes = downloaded_bytes
                 segment.last_activity = time.time()
+                if self._unreported_bytes >= PROGRESS_NOTIFY_BYTES:
+                    self._notify_changed()
     
     def complete_segment(self, segment_id: int, thread_id: str):
         """Mark segment as completed"""
@@ -175,6 +232,7 @@ class SegmentCoordinator:
                 segment.status = 'completed'
                 self.active_connections = max(0, self.active_connections - 1)
                 self.completed_segments += 1
+                self._notify_changed()
                 
                 self.logger.info(f"Segment {segment_id} completed by thread {thread_id}")
                 self.logger.info(f"Progress: {self.completed_segments}/{len(self.segments)} segments")
@@ -186,9 +244,29 @@ class SegmentCoordinator:
                 segment = self.segments[segment_id]
                 segment.status = 'failed'
                 self.active_connections = max(0, self.active_connections - 1)
+                # The download cannot complete now; stop the other segments
+                self.abort_event.set()
+                self._notify_changed()
                 
                 self.logger.error(f"Segment {segment_id} failed by thread {thread_id}: {error}")
     
+    def _notify_changed(self):
+        """Wake the progress monitor (caller holds the lock)"""
+        self._changed = True
+        self._unreported_bytes = 0
+        self.changed.notify_all()
+    
+    def wait_for_change(self, timeout: float) -> bool:
+        """Block until a segment reports progress or timeout expires
+        
+        Returns True if something changed since the previous call.
+        """
+        with self.lock:
+            if not self._changed:
+                self.changed.wait(timeout)
+            changed, self._changed = self._changed, False
+            return changed
+    
     def check_for_stalled_segments(self) -> List[SegmentState]:
         """Detect and reassign stalled segments"""
         stalled = []
@@ -216,7 +294,7 @@ class SegmentCoordinator:
     def get_progress_info(self) -> Dict:
         """Get current progress information"""
         with self.lock:
-            total_downloaded = sum(s.downloaded_bytes for s in self.segments)
+            total_downloaded = self.total_downloaded
             
             return {
                 'total_segments': len(self.segments),
@@ -231,7 +309,7 @@ class SegmentCoordinator:
 class MultiConnectionDownloader:
     """True multi-connection HTTP downloader with verification"""
     
-    def __init__(self, max_connections: int = 4, chunk_size: int = 8192):
+    def __init__(self, max_connections: int = 4, chunk_size: int = IO_CHUNK):
         self.max_connections = min(max_connections, 8)  # Cap at 8
         self.chunk_size = chunk_size
         self.logger = logging.getLogger(f"{__name__}.MultiConnectionDownloader")
@@ -279,20 +357,19 @@ class MultiConnectionDownloader:
         # Create segment coordinator
         coordinator = SegmentCoordinator(file_size, self.max_connections)
         
-        # Create temporary files for segments
+        # Segments are written at their own offsets into one preallocated
+        # temp file, which becomes the output file without a merge pass
         temp_dir = os.path.dirname(output_path)
         os.makedirs(temp_dir, exist_ok=True)
-        
-        segment_files = []
-        for i in range(self.max_connections):
-            temp_file = f"{output_path}.part{i}.tmp"
-            segment_files.append(temp_file)
+        temp_file = f"{output_path}.part"
         
         # Start download threads
         download_start = time.time()
         success = False
         
         try:
+            self._preallocate(temp_file, file_size)
+            
             with ThreadPoolExecutor(max_workers=self.max_connections, 
                                   thread_name_prefix=f"DL-{download_id}") as executor:
                 
@@ -301,24 +378,30 @@ class MultiConnectionDownloader:
                 for i in range(self.max_connections):
                     future = executor.submit(
                         self._download_segment_worker,
-                        url, coordinator, segment_files[i], download_id, progress_callback
+                        url, coordinator, temp_file, download_id, progress_callback
                     )
                     futures.append(future)
                 
-                # Monitor progress
-                while not coordinator.is_complete():
+                # Monitor progress: woken by segment events, with a heartbeat
+                # so stalls are still detected while nothing arrives
+                last_report = 0.0
+                while not coordinator.is_complete() and not coordinator.abort_event.is_set():
                     # Check for stalled segments
                     coordinator.check_for_stalled_segments()
                     
-                    # Log progress
-                    progress_info = coordinator.get_progress_info()
-                    self.logger.info(f"Download {download_id} progress: {progress_info['progress_percent']:.1f}% "
-                                   f"({progress_info['active_connections']} active connections)")
-                    
-                    if progress_callback:
-                        progress_callback(progress_info)
+                    now = time.monotonic()
+                    if now - last_report >= PROGRESS_MIN_INTERVAL:
+                        last_report = now
+                        
+                        # Log progress
+                        progress_info = coordinator.get_progress_info()
+                        self.logger.info(f"Download {download_id} progress: {progress_info['progress_percent']:.1f}% "
+                                       f"({progress_info['active_connections']} active connections)")
+                        
+                        if progress_callback:
+                            progress_callback(progress_info)
                     
-                    time.sleep(1)
+                    coordinator.wait_for_change(PROGRESS_HEARTBEAT)
                 
                 # Wait for all futures to complete
                 for future in as_completed(futures, timeout=60):
@@ -327,21 +410,27 @@ class MultiConnectionDownloader:
                     except Exception as e:
                         self.logger.error(f"Segment download failed: {e}")
             
-            # Merge segments
-            success = self._merge_segments(segment_files, output_path, file_size)
+            if coordinator.abort_event.is_set():
+                raise Exception("a segment failed, download stopped")
+            
+            # Every segment verified its own length; check the total and commit
+            total_written = coordinator.get_progress_info()['total_downloaded']
+            if total_written != file_size:
+                raise Exception(f"Final file size mismatch: expected {file_size}, got {total_written}")
+            os.replace(temp_file, output_path)
+            success = True
             
         except Exception as e:
             self.logger.error(f"Multi-connection download failed: {e}")
             success = False
         
         finally:
-            # Cleanup temporary files
-            for temp_file in segment_files:
-                try:
-                    if os.path.exists(temp_file):
-                        os.remove(temp_file)
-                except:
-                    pass
+            # Cleanup temporary file (already renamed on success)
+            try:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            except:
+                pass
         
         download_time = time.time() - download_start
         
@@ -381,7 +470,9 @@ class MultiConnectionDownloader:
                 break
             
             try:
-                self._download_single_segment(url, segment, temp_file, coordinator, thread_id)
+                if not self._download_single_segment(url, segment, temp_file, coordinator, thread_id):
+                    self.logger.info(f"Worker {thread_id} stopped - another segment failed")
+                    break
                 coordinator.complete_segment(segment.segment_id, thread_id)
                 
             except Exception as e:
@@ -390,76 +481,69 @@ class MultiConnectionDownloader:
                 break
     
     def _download_single_segment(self, url: str, segment: SegmentState, 
-                                temp_file: str, coordinator: SegmentCoordinator, thread_id: str):
-        """Download a single segment with range request"""
+                                temp_file: str, coordinator: SegmentCoordinator, thread_id: str) -> bool:
+        """Download a single segment with range request
+        
+        Returns False if the download was aborted before the segment finished.
+        """
         
         # Create range header
         range_header = f"bytes={segment.start_byte}-{segment.end_byte}"
-        headers = {'Range': range_header}
+        # The body is written raw (not content-decoded) at the segment offset,
+        # so the server must not compress it
+        headers = {'Range': range_header, 'Accept-Encoding': 'identity'}
         
         self.logger.debug(f"Thread {thread_id} downloading segment {segment.segment_id}: {range_header}")
         
         # Open new connection for this segment
         response = self.session.get(url, headers=headers, stream=True, timeout=(10, 30))
-        response.raise_for_status()
-        
-        # Verify partial content response
-        if response.status_code != 206:
-            raise Exception(f"Expected 206 Partial Content, got {response.status_code}")
-        
-        expected_size = segment.end_byte - segment.start_byte + 1
-        downloaded = 0
-        
-        # Write segment to temporary file
-        with open(temp_file, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=self.chunk_size):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    coordinator.update_segment_progress(segment.segment_id, downloaded)
+        # Closed on the way out, so an abandoned body is not handed back to the pool
+        with response:
+            response.raise_for_status()
+            
+            # Verify partial content response
+            if response.status_code != 206:
+                raise Exception(f"Expected 206 Partial Content, got {response.status_code}")
+            
+            expected_size = segment.end_byte - segment.start_byte + 1
+            downloaded = 0
+            
+            # Write the segment into its own byte range of the shared temp file.
+            # Chunks come straight from urllib3: a byte range is written as
+            # sent (never content-decoded), without requests' iter_content layer
+            is_aborted = coordinator.abort_event.is_set
+            with open(temp_file, 'r+b', buffering=0) as f:
+                f.seek(segment.start_byte)
+                for chunk in response.raw.stream(self.chunk_size, decode_content=False):
+                    if is_aborted():
+                        return False
+                    if chunk:
+                        if downloaded + len(chunk) > expected_size:
+                            raise Exception(f"Segment overrun: server sent more than {expected_size} bytes")
+                        view = memoryview(chunk)
+                        while view:
+                            view = view[f.write(view):]
+                        downloaded += len(chunk)
+                        coordinator.update_segment_progress(segment.segment_id, downloaded)
         
         # Verify segment size
         if downloaded != expected_size:
             raise Exception(f"Segment size mismatch: expected {expected_size}, got {downloaded}")
         
         self.logger.debug(f"Thread {thread_id} completed segment {segment.segment_id}: {downloaded} bytes")
+        return True
     
-    def _merge_segments(self, segment_files: List[str], output_path: str, expected_size: int) -> bool:
-        """Merge downloaded segments into final file"""
-        self.logger.info(f"Merging {len(segment_files)} segments into {output_path}")
-        
-        try:
-            total_written = 0
-            
-            with open(output_path, 'wb') as output_file:
-                for i, segment_file in enumerate(segment_files):
-                    if not os.path.exists(segment_file):
-                        self.logger.error(f"Segment file {i} missing: {segment_file}")
-                        return False
-                    
-                    with open(segment_file, 'rb') as f:
-                        chunk_count = 0
-                        while True:
-                            chunk = f.read(self.chunk_size)
-                            if not chunk:
-                                break
-                            output_file.write(chunk)
-                            total_written += len(chunk)
-                            chunk_count += 1
-                    
-                    self.logger.debug(f"Merged segment {i}: {chunk_count} chunks")
-            
-            # Verify final file size
-            if total_written != expected_size:
-                self.logger.error(f"Final file size mismatch: expected {expected_size}, got {total_written}")
-                return False
-            
-            self.logger.info(f"Successfully merged file: {total_written} bytes")
-            return True
-            
-        except Exception as e:
-            self.logger.error(f"Failed to merge segments: {e}")
-            return False
+    @staticmethod
+    def _preallocate(path: str, size: int):
+        """Create (or truncate) path and reserve size bytes for it"""
+        with open(path, 'wb') as f:
+            if hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                    return
+                except OSError:
+                    pass  # Preallocation is best effort
+            f.truncate(size)
     
     def _single_connection_download(self, url: str, output_path: str, 
                                    download_id: str, capability_info: Dict) -> Tuple[bool, Dict]:
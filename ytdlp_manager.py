@@ -217,9 +217,11 @@ def parse_sha256sums(content: str) -> Dict[str, str]:
 
 def compute_sha256(filepath: str) -> str:
     """Compute SHA-256 hash of a file."""
-    h = hashlib.sha256()
     with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(65536), b""):
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             h.update(chunk)
     return h.hexdigest()
 